@@ -0,0 +1,38 @@
+"""
+Microbenchmark of the per-request authentication overhead of auth_middleware,
+with the verified-token cache and without it (full jwt.decode + verify_hash every time).
+
+Usage:
+    export PYTHONPATH=`pwd`
+    python benchmarks/auth_overhead.py --number 20000
+"""
+import argparse
+import os
+import timeit
+
+os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+os.environ.setdefault('ALGORITHM', 'HS256')
+os.environ.setdefault('ACCESS_TOKEN_EXPIRE_MINUTES', '60')
+os.environ.setdefault('CLIENT_ID', 'benchmark-client')
+
+from datetime import timedelta
+from server.middleware.authentication import authenticate, verified_tokens
+from server.routes.auth import create_access_token, verify_token
+from utilities import constant
+from utilities.encrypto import hash_gen
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    token = create_access_token({'sub': hash_gen(constant.CLIENT_ID)}, expires_delta=timedelta(minutes=60))
+    verified_tokens.clear()
+    authenticate(token)
+
+    for name, func in (('without cache', lambda: verify_token(token)), ('with cache', lambda: authenticate(token))):
+        seconds = min(timeit.repeat(func, number=args.number, repeat=3))
+        print(f'{name:<14} {seconds / args.number * 1e6:>8.2f} us/request')
+
+if __name__ == '__main__':
+    main()
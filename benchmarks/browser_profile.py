@@ -0,0 +1,94 @@
+"""
+Compare the default Chrome profile with the lean profile (CHROME_LEAN_PROFILE=true):
+average page-ready time of the given pages and the resident memory of the whole Chrome process tree.
+
+Page-ready time is the wall time of driver.get plus waiting for the selector the crawler reads,
+so the eager page-load strategy is compared on the moment the text is usable, not on the load event.
+RSS is read from /proc, so the memory column is only available on Linux.
+
+Usage:
+    export PYTHONPATH=`pwd`
+    python benchmarks/browser_profile.py --rounds 3 \\
+        --url https://www.gongkaoleida.com/ --selector .province-name
+"""
+import argparse
+import os
+import statistics
+import time
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions
+from selenium.webdriver.support.ui import WebDriverWait
+
+from crawlers import Crawler
+
+class ProfileCrawler(Crawler):
+
+    def scrape_website(self):
+        pass
+
+def _children(pid: int) -> dict:
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 进程名可能包含空格，ppid 位于最后一个右括号之后
+        ppid = int(stat.rsplit(')', 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+def tree_rss_mb(root_pid: int) -> float:
+    if not os.path.isdir('/proc'):
+        return float('nan')
+    children = _children(root_pid)
+    pids, total = [root_pid], 0
+    while pids:
+        pid = pids.pop()
+        pids.extend(children.get(pid, []))
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total / 1024
+
+def run(lean: bool, urls, selector: str, rounds: int, headless: str):
+    os.environ['CHROME_LEAN_PROFILE'] = 'true' if lean else 'false'
+    crawler = ProfileCrawler()
+    driver = crawler._create_chrome_web_driver(headless=headless)
+    timings = []
+    try:
+        for _ in range(rounds):
+            for url in urls:
+                start = time.perf_counter()
+                driver.get(url)
+                WebDriverWait(driver, 30).until(expected_conditions.presence_of_element_located((By.CSS_SELECTOR, selector)))
+                timings.append(time.perf_counter() - start)
+        rss = tree_rss_mb(driver.service.process.pid)
+    finally:
+        driver.quit()
+    return timings, rss
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', action='append', help='page to load, can be repeated')
+    parser.add_argument('--selector', default='body', help='CSS selector that marks the page as ready')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--headless', default='true')
+    args = parser.parse_args()
+    urls = args.url or ['https://www.gongkaoleida.com/']
+
+    print(f'{"profile":<8} {"pages":>6} {"avg ready (ms)":>15} {"p50 (ms)":>9} {"chrome rss (MB)":>16}')
+    for name, lean in (('default', False), ('lean', True)):
+        timings, rss = run(lean, urls, args.selector, args.rounds, args.headless)
+        print(f'{name:<8} {len(timings):>6} {statistics.mean(timings) * 1000:>15.1f} {statistics.median(timings) * 1000:>9.1f} {rss:>16.1f}')
+
+if __name__ == '__main__':
+    main()
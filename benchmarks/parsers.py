@@ -0,0 +1,209 @@
+"""
+Offline benchmark suite of the extraction path, run from saved gongkaoleida pages and a corpus of 报名时间 strings.
+For every function it reports throughput and the peak memory allocated during one pass over the corpus (tracemalloc),
+then checks the extracted fields against golden outputs so that optimizations do not silently change what we store.
+
+Fixtures layout (--fixtures, default benchmarks/fixtures):
+    detail/*.html   article detail pages, as downloaded
+    list/*.html     province list pages, as downloaded
+    deadlines.tsv   one "<collect date>\\t<报名时间 text>" per line
+    golden.json     expected outputs, written by --update-golden
+
+The committed seed corpus reproduces the page structure the crawler's selectors read (.date, .article-title h1,
+.jobinfo-list, .article-detail article, .notice-list li) and the 报名时间 formats listed in utilities/timeutil.py.
+--record downloads real pages with the crawler's HTTP session and appends the 报名时间 text of every recorded
+detail page to deadlines.tsv; review the pages before committing them, then refresh golden.json with --update-golden.
+The AI fallback of timeutil.extract_end_datetime is disabled, so texts the regex cannot handle have a stable output.
+
+Usage:
+    export PYTHONPATH=`pwd`
+    python benchmarks/parsers.py --record detail https://www.gongkaoleida.com/article/...
+    python benchmarks/parsers.py --update-golden
+    python benchmarks/parsers.py --number 20
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+# 离线运行，本地索引写到临时目录
+os.environ['SEEN_TITLES_PATH'] = os.path.join(tempfile.mkdtemp(), 'seen_titles.txt')
+os.environ.setdefault('ACCESS_TOKEN_EXPIRE_MINUTES', '60')
+
+from bs4 import BeautifulSoup
+
+from crawlers.gkld import Trace
+from crawlers.gkld.crawler import GkldCrawler
+from utilities import sanitizer, timeutil
+
+# 离线运行：AI服务视为不可用，与请求失败时的返回值相同
+timeutil.extract_end_dt_with_ai = lambda text, collect_date_str, timer=None: (False, text)
+
+DATETIME_PATTERN = r"(\d{4}.\d{1,2}.?(\d{1,2}.?)?(.?\d{1,2}:\d{1,2})?)"
+
+def read_fixtures(fixtures_dir: str, kind: str) -> Dict[str, str]:
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, kind, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            pages[f'{kind}/{os.path.basename(path)}'] = f.read()
+    return pages
+
+def read_deadlines(fixtures_dir: str) -> List[List[str]]:
+    path = os.path.join(fixtures_dir, 'deadlines.tsv')
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [line.rstrip('\n').split('\t', 1) for line in f if '\t' in line]
+
+def parse_list_page(html: str) -> List[dict]:
+    # 与 flow.SNAPSHOT_SCRIPT 对 '.notice-list li' 的读取方式一致
+    items = []
+    for li in BeautifulSoup(html, sanitizer.FAST_HTML_PARSER).select('.notice-list li'):
+        a = li if li.name == 'a' else li.find('a')
+        time_tag = li.find('time')
+        items.append({
+            'href': a.get('href') if a else None,
+            'title': (a.get('title') or a.get_text()).strip() if a else None,
+            'time': time_tag.get_text().strip() if time_tag else None,
+        })
+    return items
+
+def extract_detail(crawler: GkldCrawler, html: str) -> dict:
+    # 与 process_province_page 中HTTP模式的 save_page 相同的提取步骤
+    page = BeautifulSoup(html, sanitizer.FAST_HTML_PARSER)
+    collect_date_str = crawler.parse_collect_date(page.select_one('.date').decode_contents())
+    content = crawler.sanitize_article_content(page.select_one('div[class="article-detail"] > article'))
+    return {
+        'title': crawler.parse_article_title(str(page.select_one('div[class="article-title"] > h1'))).replace('/', '|'),
+        'collect_date': collect_date_str,
+        'apply_deadline': crawler.extract_apply_deadline_from_page(page, collect_date_str),
+        'content_sha256': hashlib.sha256(content.encode('utf-8')).hexdigest(),
+    }
+
+def extract_list(crawler: GkldCrawler, html: str) -> List[dict]:
+    items = parse_list_page(html)
+    for item in items:
+        # 相对时间（如“3小时前”）依赖当前时间，不纳入比较
+        if item['time'] and '前' not in item['time']:
+            item['notice_date'] = crawler.parse_notice_date(item['time']).isoformat()
+    return items
+
+def extract_all(crawler: GkldCrawler, details: Dict[str, str], lists: Dict[str, str], deadlines: List[List[str]]) -> dict:
+    outputs = {name: extract_detail(crawler, html) for name, html in details.items()}
+    outputs.update({name: extract_list(crawler, html) for name, html in lists.items()})
+    outputs['deadlines.tsv'] = [timeutil.extract_end_datetime(text, collect_date) for collect_date, text in deadlines]
+    return outputs
+
+def measure(func: Callable, inputs: list, number: int):
+    tracemalloc.start()
+    for args in inputs:
+        func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(number):
+        for args in inputs:
+            func(*args)
+    seconds = time.perf_counter() - start
+    return number * len(inputs) / seconds, peak / 1024
+
+def benchmark(crawler: GkldCrawler, details: Dict[str, str], lists: Dict[str, str], deadlines: List[List[str]], number: int):
+    pages = [BeautifulSoup(html, sanitizer.FAST_HTML_PARSER) for html in details.values()]
+    collect_dates = [crawler.parse_collect_date(p.select_one('.date').decode_contents()) for p in pages]
+    notice_times = [item['time'] for html in lists.values() for item in parse_list_page(html) if item['time'] and '前' not in item['time']]
+    date_strs = [m[0] for _, text in deadlines for m in re.findall(DATETIME_PATTERN, text)]
+    cases = [
+        ('parse page', lambda html: BeautifulSoup(html, sanitizer.FAST_HTML_PARSER), [(html,) for html in details.values()]),
+        ('parse_article_title', crawler.parse_article_title, [(str(p.select_one('div[class="article-title"] > h1')),) for p in pages]),
+        ('parse_collect_date', crawler.parse_collect_date, [(p.select_one('.date').decode_contents(),) for p in pages]),
+        ('extract_apply_deadline', crawler.extract_apply_deadline_from_page, list(zip(pages, collect_dates))),
+        ('sanitize_article_content', crawler.sanitize_article_content, [(p.select_one('div[class="article-detail"] > article').decode_contents(),) for p in pages]),
+        ('parse list page', parse_list_page, [(html,) for html in lists.values()]),
+        ('parse_notice_date', crawler.parse_notice_date, [(t,) for t in notice_times]),
+        ('extract_end_datetime', lambda text, collect_date: timeutil.extract_end_datetime(text, collect_date), [(text, collect_date) for collect_date, text in deadlines]),
+        ('format_date', timeutil.format_date, [(s,) for s in date_strs]),
+    ]
+    print(f'{"function":<26} {"inputs":>7} {"calls/s":>10} {"peak KB/pass":>13}')
+    for name, func, inputs in cases:
+        if not inputs:
+            print(f'{name:<26} {0:>7} {"-":>10} {"-":>13}')
+            continue
+        calls_per_second, peak_kb = measure(func, inputs, number)
+        print(f'{name:<26} {len(inputs):>7} {calls_per_second:>10.0f} {peak_kb:>13.1f}')
+
+def diff_golden(golden: dict, outputs: dict) -> List[str]:
+    mismatches = [name for name in golden if name not in outputs]
+    for name, output in outputs.items():
+        if name not in golden:
+            mismatches.append(f'{name} (no golden output)')
+        elif golden[name] != output:
+            mismatches.append(name)
+    return mismatches
+
+def record(crawler: GkldCrawler, fixtures_dir: str, kind: str, urls: List[str]):
+    os.makedirs(os.path.join(fixtures_dir, kind), exist_ok=True)
+    for url in urls:
+        response = crawler.http_session.get(url)
+        response.raise_for_status()
+        html = response.content.decode(response.apparent_encoding or 'utf-8')
+        name = re.sub(r'[^\w.-]+', '_', url.split('://', 1)[-1]).strip('_')[:120] + '.html'
+        with open(os.path.join(fixtures_dir, kind, name), 'w', encoding='utf-8') as f:
+            f.write(html)
+        print(f'saved {kind}/{name}')
+        if kind == 'detail':
+            page = BeautifulSoup(html, sanitizer.FAST_HTML_PARSER)
+            date = page.select_one('.date')
+            job_info = next((li for li in page.select('div[class="jobinfo-list"] li') if '报名时间' in li.get_text()), None)
+            if date and job_info:
+                with open(os.path.join(fixtures_dir, 'deadlines.tsv'), 'a', encoding='utf-8') as f:
+                    f.write(f"{crawler.parse_collect_date(date.decode_contents())}\t{' '.join(job_info.get_text().split())}\n")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fixtures', default=os.path.join(os.path.dirname(__file__), 'fixtures'))
+    parser.add_argument('--number', type=int, default=10, help='passes over the corpus per function')
+    parser.add_argument('--record', nargs='+', metavar=('KIND', 'URL'), help='download pages into the fixtures, KIND is detail or list')
+    parser.add_argument('--update-golden', action='store_true', help='write the current outputs as golden outputs')
+    args = parser.parse_args()
+
+    crawler = GkldCrawler(Trace())
+    if args.record:
+        kind, urls = args.record[0], args.record[1:]
+        if kind not in ('detail', 'list') or not urls:
+            parser.error('--record expects detail|list followed by at least one URL')
+        record(crawler, args.fixtures, kind, urls)
+        return
+
+    details, lists, deadlines = read_fixtures(args.fixtures, 'detail'), read_fixtures(args.fixtures, 'list'), read_deadlines(args.fixtures)
+    if not (details or lists or deadlines):
+        sys.exit(f'no fixtures in {args.fixtures}, record some with --record')
+    print(f'{len(details)} detail pages, {len(lists)} list pages, {len(deadlines)} 报名时间 strings')
+
+    outputs = extract_all(crawler, details, lists, deadlines)
+    golden_path = os.path.join(args.fixtures, 'golden.json')
+    if args.update_golden:
+        with open(golden_path, 'w', encoding='utf-8') as f:
+            json.dump(outputs, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f'golden outputs written to {golden_path}')
+        return
+
+    benchmark(crawler, details, lists, deadlines, args.number)
+    if not os.path.exists(golden_path):
+        print('no golden outputs, write them with --update-golden')
+        return
+    with open(golden_path, encoding='utf-8') as f:
+        mismatches = diff_golden(json.load(f), outputs)
+    for name in mismatches:
+        print(f'golden mismatch: {name}')
+    print('golden outputs match' if not mismatches else f'{len(mismatches)} golden mismatches')
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == '__main__':
+    main()
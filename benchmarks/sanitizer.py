@@ -0,0 +1,84 @@
+"""
+Benchmark of article HTML sanitization: the previous implementation (find_all with a tag.text predicate,
+then serialize and rebuild the replacement regex) against utilities.sanitizer.HtmlSanitizer.
+Both must produce the same HTML for every fixture, a mismatch is reported and makes the script exit with 1.
+
+Fixtures are *.html files: detail pages, as committed in benchmarks/fixtures/detail, from which the innerHTML of
+div.article-detail > article is taken, or article bodies saved on their own.
+When the fixtures directory has none, a synthetic nested article is generated so the script still runs;
+its numbers are only indicative.
+
+Usage:
+    export PYTHONPATH=`pwd`
+    python benchmarks/sanitizer.py --number 200
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import timeit
+
+from bs4 import BeautifulSoup
+
+from utilities.sanitizer import FAST_HTML_PARSER, HtmlSanitizer, default_rules
+
+def legacy_sanitize(content: str) -> str:
+    def _should_remove(tag):
+        if '公考雷达' in tag.text:
+            return True
+        if tag.name == 'a' and tag.get('href') and 'www.gongkaoleida.com/search' in tag.get('href'):
+            return True
+        return False
+
+    soup = BeautifulSoup(content, 'html.parser')
+    for element in soup.find_all(_should_remove):
+        element.extract()
+    replacements = {r'公考雷达': os.getenv('APP_NAME', '公考营地')}
+    pattern = re.compile('|'.join(re.escape(key) for key in replacements.keys()))
+    return pattern.sub(lambda x: replacements[x.group(0)], str(soup))
+
+def read_article(html: str) -> str:
+    # 详情页只取正文部分，与爬虫传给 sanitize_article_content 的内容一致
+    article = BeautifulSoup(html, FAST_HTML_PARSER).select_one('div[class="article-detail"] > article')
+    return article.decode_contents() if article else html
+
+def synthetic_article() -> str:
+    rows = ''.join(f'<tr><td><span>岗位{i}</span></td><td><p>招录<b>{i}</b>人，报名时间2024-01-0{i % 9 + 1}</p></td></tr>' for i in range(200))
+    return (
+        '<p>来源：公考雷达整理</p>'
+        '<div><section><div><p>一、招录计划</p>'
+        f'<table><tbody>{rows}</tbody></table></div></section></div>'
+        '<p><a href="https://www.gongkaoleida.com/search?k=1">查看更多</a></p>'
+        '<p>附件：<a href="https://example.com/a.xls">岗位表</a></p>'
+    )
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fixtures', default=os.path.join(os.path.dirname(__file__), 'fixtures', 'detail'))
+    parser.add_argument('--number', type=int, default=50)
+    args = parser.parse_args()
+
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(args.fixtures, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            fixtures[os.path.basename(path)] = read_article(f.read())
+    if not fixtures:
+        print(f'no fixtures in {args.fixtures}, using a synthetic article')
+        fixtures['synthetic'] = synthetic_article()
+
+    sanitizer = HtmlSanitizer(**default_rules())
+    mismatches = [name for name, html in fixtures.items() if legacy_sanitize(html) != sanitizer.sanitize(html)]
+    for name in mismatches:
+        print(f'output differs: {name}')
+
+    total_kb = sum(len(html.encode('utf-8')) for html in fixtures.values()) / 1024
+    print(f'{len(fixtures)} fixtures, {total_kb:.1f} KB')
+    for name, func in (('legacy', legacy_sanitize), ('HtmlSanitizer', sanitizer.sanitize)):
+        seconds = min(timeit.repeat(lambda: [func(html) for html in fixtures.values()], number=args.number, repeat=3))
+        per_article = seconds / args.number / len(fixtures)
+        print(f'{name:<14} {per_article * 1000:>8.2f} ms/article {total_kb * args.number / seconds:>10.0f} KB/s')
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == '__main__':
+    main()
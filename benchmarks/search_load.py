@@ -0,0 +1,120 @@
+"""
+Load test of POST /articles/all against a local stand-in Meilisearch.
+
+The stand-in answers every search after a fixed delay, so the numbers show how many
+searches one uvicorn worker can overlap rather than how fast Meilisearch is.
+The async handler of the article subapp is compared with a baseline handler that calls
+the synchronous meilisearch client, as the subapp did before.
+
+Usage:
+    export PYTHONPATH=`pwd`
+    python benchmarks/search_load.py --requests 500 --concurrency 50 --latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+
+STANDIN_PORT = 7799
+APP_PORT = 8799
+
+os.environ['MEILISEARCH_URL'] = f'http://127.0.0.1:{STANDIN_PORT}'
+# 关闭搜索结果缓存，每个请求都会访问 Meilisearch
+os.environ.setdefault('SEARCH_CACHE_TTL', '0')
+os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+os.environ.setdefault('ALGORITHM', 'HS256')
+os.environ.setdefault('ACCESS_TOKEN_EXPIRE_MINUTES', '60')
+os.environ.setdefault('CLIENT_ID', 'benchmark-client')
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+
+def create_standin_meilisearch(latency: float) -> FastAPI:
+    standin = FastAPI()
+    hit = {'id': '1', 'title': '标题', 'province': '国家', 'exam_type': '公务员', 'info_type': '招考公告', 'collect_date': 1704038400.0, 'apply_deadline': None}
+
+    settings = {}
+
+    @standin.get('/indexes/{uid}/settings')
+    async def get_settings(uid: str):
+        return settings
+
+    @standin.patch('/indexes/{uid}/settings')
+    async def update_settings(uid: str, request: Request):
+        settings.update(await request.json())
+        return {'taskUid': 0, 'indexUid': uid, 'status': 'enqueued', 'type': 'settingsUpdate', 'enqueuedAt': '2024-01-01T00:00:00.000000Z'}
+
+    @standin.get('/tasks/{task_uid}')
+    async def get_task(task_uid: int):
+        return {'uid': task_uid, 'indexUid': 'articles', 'status': 'succeeded', 'type': 'settingsUpdate', 'details': {}, 'error': None, 'canceledBy': None,
+                'duration': 'PT0S', 'enqueuedAt': '2024-01-01T00:00:00.000000Z', 'startedAt': '2024-01-01T00:00:00.000000Z', 'finishedAt': '2024-01-01T00:00:00.000000Z'}
+
+    @standin.post('/indexes/{uid}/search')
+    async def search(uid: str, request: Request):
+        await asyncio.sleep(latency)
+        return {'hits': [hit] * 20, 'query': '', 'processingTimeMs': int(latency * 1000), 'limit': 20, 'offset': 0, 'estimatedTotalHits': 20}
+
+    return standin
+
+def serve_in_thread(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def create_app() -> FastAPI:
+    # 需在设置好环境变量之后再导入
+    from server.main import app
+    from server.model.body import SearchArticles
+    from server.model.response import Response
+    from server.subapp.article import _subapp_article, meilisearch_article_manager
+
+    @_subapp_article.post('/baseline')
+    async def blocking_search_articles(params: SearchArticles):
+        search_results, next_cursor = meilisearch_article_manager.search_articles(query=params.query, page=params.page, filters=params.filters)
+        return Response(code=1, msg='Success', result=search_results, cursor=next_cursor)
+
+    return app
+
+async def run_load(path: str, headers: dict, num_of_requests: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    body = {'query': '', 'page': 1, 'filters': {'province': '国家'}}
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{APP_PORT}', limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one_request():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(path, json=body, headers=headers)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(num_of_requests)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f'{path:<20} {num_of_requests / elapsed:>10.1f} req/s   p50 {statistics.median(latencies) * 1000:>8.1f} ms   p99 {p99 * 1000:>8.1f} ms')
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds the stand-in Meilisearch sleeps per search')
+    args = parser.parse_args()
+
+    serve_in_thread(create_standin_meilisearch(args.latency), STANDIN_PORT)
+    serve_in_thread(create_app(), APP_PORT)
+
+    from server.routes.auth import create_access_token
+    from utilities import constant
+    from utilities.encrypto import hash_gen
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": hash_gen(constant.CLIENT_ID)})}'}
+    for path in ('/articles/baseline', '/articles/all'):
+        asyncio.run(run_load(path, headers, args.requests, args.concurrency))
+
+if __name__ == '__main__':
+    main()
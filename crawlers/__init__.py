@@ -1,24 +1,89 @@
 from abc import ABC, abstractmethod
+import os
+from typing import List
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 
-from utilities import constant
+from utilities import constant, loggers
+
+# 精简模式下默认屏蔽的资源类型，只读取文本时这些资源都不需要
+DEFAULT_BLOCKED_RESOURCE_TYPES = 'image,font,media'
+# 资源类型 -> DevTools Network.setBlockedURLs 的url匹配模式
+RESOURCE_TYPE_URL_PATTERNS = {
+    'image': ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico', '*.bmp'],
+    'font': ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'],
+    'media': ['*.mp4', '*.webm', '*.mp3', '*.ogg', '*.m3u8', '*.flv'],
+    'stylesheet': ['*.css'],
+}
+# 默认屏蔽的第三方统计与广告域名
+DEFAULT_BLOCKED_DOMAINS = 'hm.baidu.com,cpro.baidustatic.com,pos.baidu.com,s.cnzz.com,c.cnzz.com,www.googletagmanager.com,www.google-analytics.com,googleads.g.doubleclick.net'
+
+def _split_env_list(name: str, default: str) -> List[str]:
+    return [item.strip() for item in os.getenv(name, default).split(',') if item.strip()]
 
 class Crawler(ABC):
 
+    @staticmethod
+    def is_lean_profile() -> bool:
+        return os.getenv('CHROME_LEAN_PROFILE', 'false').lower() == 'true'
+
+    @staticmethod
+    def blocked_domains() -> List[str]:
+        return _split_env_list('CHROME_BLOCKED_DOMAINS', DEFAULT_BLOCKED_DOMAINS)
+
+    @staticmethod
+    def blocked_url_patterns() -> List[str]:
+        patterns = []
+        for resource_type in _split_env_list('CHROME_BLOCKED_RESOURCE_TYPES', DEFAULT_BLOCKED_RESOURCE_TYPES):
+            if resource_type.lower() not in RESOURCE_TYPE_URL_PATTERNS:
+                loggers.error_file_logger.error(f'不支持屏蔽的资源类型: {resource_type}')
+                continue
+            patterns.extend(RESOURCE_TYPE_URL_PATTERNS[resource_type.lower()])
+        for domain in Crawler.blocked_domains():
+            patterns.extend([f'*://{domain}/*', f'*://*.{domain}/*'])
+        return patterns
+
+    def _add_lean_options(self, chrome_options: Options):
+        # 只等待DOM解析完成，不等待图片等子资源
+        chrome_options.page_load_strategy = 'eager'
+        chrome_options.add_argument('--disable-extensions')
+        chrome_options.add_argument('--disable-gpu')
+        # 浏览器级别的设置对所有标签页生效，包括 window.open 打开的新标签页
+        if 'image' in [t.lower() for t in _split_env_list('CHROME_BLOCKED_RESOURCE_TYPES', DEFAULT_BLOCKED_RESOURCE_TYPES)]:
+            chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+            chrome_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        rules = ','.join(f'MAP {domain} ~NOTFOUND, MAP *.{domain} ~NOTFOUND' for domain in self.blocked_domains())
+        if rules:
+            chrome_options.add_argument(f'--host-resolver-rules={rules}')
+
+    def block_resources(self, driver: webdriver.Chrome):
+        """
+         Block the configured resource types and third-party domains in the current tab through DevTools network interception.
+         The interception is per tab, call it again after switching to a tab that will be reused for navigation.
+
+         Args:
+         	 driver: WebDriver whose current tab should block resources
+        """
+        if not self.is_lean_profile():
+            return
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.blocked_url_patterns()})
+
     def _create_chrome_web_driver(self, headless: bool = False):
         chrome_options = Options()
         if headless.lower() == "true":
             chrome_options.add_argument('--headless')  # 启用headless模式
             chrome_options.add_argument("--window-size=1920,1080")  # 设置窗口大小
+        if self.is_lean_profile():
+            self._add_lean_options(chrome_options)
         # 创建Chrome WebDriver
         chrome_options.binary_location = constant.CHROME_BROWSER_PATH_FOR_SELENIUM
         driver = webdriver.Chrome(options=chrome_options)
         driver.implicitly_wait(10)
+        self.block_resources(driver)
         return driver
 
     @abstractmethod
     def scrape_website(self):
         pass
-
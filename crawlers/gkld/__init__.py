@@ -1,8 +1,154 @@
-from pydantic import BaseModel
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pydantic import BaseModel, PrivateAttr
 
 class Trace(BaseModel):
     province: set = set()
     exam_type: str = ''
     info_type: str = ''
     scrape_times: int = 1
-    scraped_articles: int = 0
\ No newline at end of file
+    scraped_articles: int = 0
+    # 因早于水位而未打开的分页数
+    skipped_pages: int = 0
+    # 已完成的分区，分区由 partition_key 生成
+    finished_partitions: set = set()
+    # 分区 -> 已完成的最大页码
+    finished_pages: dict = {}
+    # 分区 -> 本次爬取使用的水位(collect_date的时间戳)，每次爬取每个分区只查询一次
+    watermarks: dict = {}
+    # 阶段 -> [次数, 总耗时(秒)]
+    timings: dict = {}
+    # 计数器名称 -> 次数
+    counters: dict = {}
+    # 检查点文件路径，为空时不落盘
+    checkpoint_path: str = ''
+    _lock: threading.RLock = PrivateAttr(default_factory=threading.RLock)
+
+    @staticmethod
+    def partition_key(province: str, info_type: str, exam_type: str) -> str:
+        return f'{province}|{info_type}|{exam_type}'
+
+    def merge(self, other: 'Trace') -> 'Trace':
+        # 合并并行worker各自的进度
+        with self._lock:
+            self.province |= other.province
+            self.scraped_articles += other.scraped_articles
+            self.skipped_pages += other.skipped_pages
+            self.finished_partitions |= other.finished_partitions
+            for key, page in other.finished_pages.items():
+                self.finished_pages[key] = max(page, self.finished_pages.get(key, 0))
+            self.watermarks.update(other.watermarks)
+            for stage, (count, seconds) in other.timings.items():
+                self.record_timing(stage, seconds, count)
+            for name, count in other.counters.items():
+                self.incr(name, count)
+        return self
+
+    def record_timing(self, stage: str, seconds: float, count: int = 1):
+        with self._lock:
+            total_count, total_seconds = self.timings.get(stage, [0, 0.0])
+            self.timings[stage] = [total_count + count, total_seconds + seconds]
+
+    def incr(self, name: str, count: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+
+    @contextmanager
+    def timer(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_timing(stage, time.perf_counter() - start)
+
+    def timing_summary(self) -> str:
+        with self._lock:
+            return ', '.join(f'{stage}: {count}次, 平均{seconds / count:.3f}s' for stage, (count, seconds) in sorted(self.timings.items()) if count)
+
+    def write_run_summary(self, directory: str, started_at: datetime, status: str) -> str:
+        """
+         Write the timers and counters of this run to a JSON file named after the start time of the run.
+
+         Args:
+         	 directory: Directory of the run summary files
+         	 started_at: Start time of the run
+         	 status: Final status of the run, e.g. finished or failed
+
+         Returns:
+         	 Path of the summary file
+        """
+        finished_at = datetime.now(started_at.tzinfo)
+        with self._lock:
+            summary = {
+                'started_at': started_at.isoformat(),
+                'finished_at': finished_at.isoformat(),
+                'duration_seconds': (finished_at - started_at).total_seconds(),
+                'status': status,
+                'scrape_times': self.scrape_times,
+                'scraped_articles': self.scraped_articles,
+                'skipped_pages': self.skipped_pages,
+                'finished_provinces': sorted(self.province),
+                'stages': {
+                    stage: {'count': count, 'total_seconds': seconds, 'avg_seconds': seconds / count if count else 0}
+                    for stage, (count, seconds) in sorted(self.timings.items())
+                },
+                'counters': dict(sorted(self.counters.items())),
+            }
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"run-{started_at.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return path
+
+    def finish_page(self, key: str, page: int):
+        with self._lock:
+            self.finished_pages[key] = page
+
+    def finish_partition(self, key: str):
+        with self._lock:
+            self.finished_partitions.add(key)
+            self.finished_pages.pop(key, None)
+
+    def finish_province(self, province: str):
+        with self._lock:
+            self.province.add(province)
+
+    def set_watermark(self, key: str, timestamp: float):
+        with self._lock:
+            self.watermarks[key] = timestamp
+
+    def save(self):
+        if not self.checkpoint_path:
+            return
+        # 写入线程与爬取线程可能同时保存，临时文件的写入与替换都在锁内完成
+        with self._lock:
+            content = self.model_dump_json()
+            # 先写临时文件再替换，避免进程崩溃时留下不完整的检查点
+            os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+            tmp_path = f'{self.checkpoint_path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, self.checkpoint_path)
+
+    def discard(self):
+        # 爬取全部完成后删除检查点，下次爬取从头开始
+        with self._lock:
+            if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+                os.remove(self.checkpoint_path)
+
+    @classmethod
+    def load(cls, checkpoint_path: str) -> 'Trace':
+        if not os.path.exists(checkpoint_path):
+            return cls(checkpoint_path=checkpoint_path)
+        with open(checkpoint_path, encoding='utf-8') as f:
+            trace = cls.model_validate_json(f.read())
+        trace.checkpoint_path = checkpoint_path
+        return trace
+
+class ArticleStructureError(Exception):
+    """详情页不符合预期的页面结构"""
+    pass
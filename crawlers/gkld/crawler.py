@@ -1,260 +1,703 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import glob
+from queue import Empty, Queue
 import uuid
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
 import dateparser
-from functools import partial
 import os
 import re
-import time
-from typing import List
+import requests
+import threading
+from typing import Dict, List, Optional, Set, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 from dotenv import load_dotenv
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webelement import WebElement
-from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from dateutil.relativedelta import relativedelta
 from crawlers import Crawler
-from crawlers.gkld import Trace
+from crawlers.gkld import ArticleStructureError, Trace
 from db.mongodb.articles import UnicloudDBArticleManager
-from models.article import Article, ArticleManager
+from models.article import Article, ArticleManager, BufferedArticleWriter
 # from search_engine.meilisearch.articles import MeiliSearchArticleManager
-from utilities import Singleton, constant, flow, loggers, timeutil
+from utilities import Singleton, constant, flow, httpclient, loggers, sanitizer, timeutil
+from utilities.titleindex import SeenTitleIndex
 from selenium.common.exceptions import WebDriverException
 
+HOMEPAGE_URL = 'https://www.gongkaoleida.com/'
+
+# 读取筛选选项框的勾选状态，找不到时返回null
+CHECKBOX_STATE_SCRIPT = """
+var icons = document.querySelectorAll('i[class*="icon-check"], i[class*="icon-oncheck"]');
+for (var i = 0; i < icons.length; i++) {
+    for (var e = icons[i].nextElementSibling; e; e = e.nextElementSibling) {
+        if (e.tagName === 'A' && e.textContent.indexOf(arguments[0]) !== -1) {
+            return icons[i].className.indexOf('icon-oncheck') !== -1 ? 'checked' : 'unchecked';
+        }
+    }
+}
+return null;
+"""
+
+def with_query_params(url: str, **params) -> str:
+    # 保留url中已有的查询参数（包括重复的参数名，如 type=10&type=20），只替换同名参数
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key not in params]
+    query += [(key, str(value)) for key, value in params.items()]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
 @Singleton
 class GkldCrawler(Crawler):
     
     def __init__(self, trace: Trace):
         self.trace = trace
+        # 详情页的HTTP采集共用一个连接池
+        self.http_session = httpclient.create_session(headers={'User-Agent': constant.USER_AGENT})
+        # 本地已知标题索引，命中时无需再向存储查询
+        self.seen_titles = SeenTitleIndex(os.getenv('SEEN_TITLES_PATH', './data/seen_titles.txt'))
+        # 过滤与替换规则只在启动时加载并编译一次
+        self.sanitizer = sanitizer.HtmlSanitizer.from_config()
+        # 筛选选项 -> (查询参数名, 参数值)，每次运行只探测一次；为 None 表示网站的筛选条件不在URL中
+        self.filter_params: Optional[Dict[str, Tuple[str, str]]] = {}
+        self._filter_params_lock = threading.Lock()
 
-    def extract_article_title(self, driver: webdriver.Chrome):
-        h1_element = driver.find_element(By.XPATH, './/div[@class="article-title"]/h1')
+    def warm_seen_titles(self, article_manager: ArticleManager):
+        # 本地索引为空时（如首次运行），从存储中加载已有的标题
+        if len(self.seen_titles) == 0:
+            self.seen_titles.update(article_manager.iterate_titles())
+            loggers.debug_file_logger.debug(f"从存储中加载了{len(self.seen_titles)}个已有标题")
+
+    def create_article_writer(self, article_manager: ArticleManager, trace: Trace) -> BufferedArticleWriter:
+        def _on_flushed(articles: List[Article]):
+            # 写入成功后才记入本地标题索引
+            self.seen_titles.update(a.title for a in articles)
+            trace.incr('inserted_articles', len(articles))
+            # 已完成页面的文章均已写入，此时保存检查点
+            trace.save()
+
+        return BufferedArticleWriter(
+            article_manager,
+            batch_size=int(os.getenv('INSERT_BATCH_SIZE', 50)),
+            flush_interval=float(os.getenv('INSERT_FLUSH_INTERVAL', 30)),
+            on_flushed=_on_flushed,
+            timer=trace.timer,
+        )
+
+    def get_partition_watermark(self, article_manager: ArticleManager, trace: Trace, province_name: str, info_type: str, exam_type: str, end_dt: datetime) -> datetime:
+        """
+         Return the lower bound of the collect date of the partition, fetched once per partition per run and kept in the trace.
+
+         The watermark has to stay fixed while the partition is scraped (and after a restart), otherwise the articles inserted by
+         this run would raise it and the older pages not scraped yet would be skipped.
+        """
+        key = Trace.partition_key(province_name, info_type, exam_type)
+        if key not in trace.watermarks:
+            filters={
+                'province': province_name,
+                'exam_type': exam_type,
+                'info_type': info_type,
+            }
+            start_dt: datetime = article_manager.get_max_collect_date(filters) or end_dt - relativedelta(months=3)
+            trace.set_watermark(key, start_dt.timestamp())
+            trace.save()
+        return datetime.fromtimestamp(trace.watermarks[key], timeutil.get_tz())
+
+    def filter_new_titles(self, article_writer: BufferedArticleWriter, article_titles: List[str]) -> Set[str]:
+        """
+         Filter out the titles that already exist, checking the local index first and the store in a single batch call.
+
+         Args:
+         	 article_writer: Writer whose pending articles and article manager are checked for the titles unknown to the local index
+         	 article_titles: Titles to be checked
+
+         Returns: 
+         	 The titles that do not exist in the store yet
+
+         Raises:
+         	 Any error of the store lookup, so that the page is not marked finished and is scraped again
+        """
+        unknown_titles = [t for t in set(article_titles) if t not in self.seen_titles and not article_writer.is_pending(t)]
+        if not unknown_titles:
+            return set()
+        # 查询失败时抛出异常，当前分页不会被记为已完成，下次爬取时重新检查
+        existing_titles = article_writer.article_manager.get_existing_titles(unknown_titles)
+        self.seen_titles.update(existing_titles)
+        return set(unknown_titles) - existing_titles
+
+    def parse_article_title(self, h1_html: str) -> str:
         # 使用BeautifulSoup解析<h1>元素的HTML内容
-        soup = BeautifulSoup(h1_element.get_attribute("outerHTML"), "html.parser")
+        soup = BeautifulSoup(h1_html, "html.parser")
         # 剔除<a>元素内的文本内容
         for a in soup.find_all("a"):
             a.extract()
         # 获取<h1>元素的纯文本内容并输出
         return soup.get_text().strip()
+
+    def extract_article_title(self, driver: webdriver.Chrome):
+        h1_element = driver.find_element(By.XPATH, './/div[@class="article-title"]/h1')
+        return self.parse_article_title(h1_element.get_attribute("outerHTML"))
     
-    def is_date_invalid(self, e: WebElement, start_dt: datetime, end_dt: datetime):
-        date_str = e.find_element(By.XPATH, './/time').text
+    def parse_notice_date(self, date_str: str) -> datetime:
         date_time: datetime = dateparser.parse(date_str) if '前' in date_str else datetime.strptime(date_str, constant.HYPHEN_JOINED_DATE_FORMAT)
+        return timeutil.localize_native_dt(date_time)
+
+    def is_date_invalid(self, date_str: str, start_dt: datetime, end_dt: datetime):
         # 检查
         if start_dt.tzinfo.zone == end_dt.tzinfo.zone == timeutil.get_tz().zone:
-            is_within_range = start_dt <= timeutil.localize_native_dt(date_time) <= end_dt
+            is_within_range = start_dt <= self.parse_notice_date(date_str) <= end_dt
             return not is_within_range
         else:
             raise Exception('Inconsistent TZ')
 
-    def extract_collect_date(self, driver: webdriver.Chrome):
-        date = driver.find_element(By.CLASS_NAME, 'date').get_attribute('innerHTML')
-        match = re.search(constant.HYPHEN_JOINED_DATE_REGEX, date)
+    def parse_collect_date(self, date_html: str) -> str:
+        match = re.search(constant.HYPHEN_JOINED_DATE_REGEX, date_html)
         date: str = match.group()
         return date
 
-    def extract_apply_deadline(self, driver: webdriver.Chrome, collect_date_str: str):
+    def extract_collect_date(self, driver: webdriver.Chrome):
+        date = driver.find_element(By.CLASS_NAME, 'date').get_attribute('innerHTML')
+        return self.parse_collect_date(date)
+
+    def parse_apply_deadline(self, job_info_text: str, collect_date_str: str, trace: Trace = None):
+        res = timeutil.extract_end_datetime(job_info_text, collect_date_str, timer=trace.timer if trace else None)
+        return res if res else re.sub(r"报名时间[：:]", '', job_info_text)
+
+    def extract_apply_deadline(self, driver: webdriver.Chrome, collect_date_str: str, trace: Trace = None):
         deadline = None
         try:
             job_info = driver.find_element(By.XPATH, '//div[@class="jobinfo-list"]//li[contains(., "报名时间")]')
-            res = timeutil.extract_end_datetime(job_info.text, collect_date_str)
-            deadline = res if res else re.sub(r"报名时间[：:]", '', job_info.text)
+            deadline = self.parse_apply_deadline(job_info.text, collect_date_str, trace)
+        except:
+            pass
+        return deadline
+
+    def extract_apply_deadline_from_page(self, page: BeautifulSoup, collect_date_str: str, trace: Trace = None):
+        deadline = None
+        try:
+            job_info = next(li for li in page.select('div[class="jobinfo-list"] li') if '报名时间' in li.get_text())
+            # 与Selenium的WebElement.text保持一致，合并空白字符
+            deadline = self.parse_apply_deadline(' '.join(job_info.get_text().split()), collect_date_str, trace)
         except:
             pass
         return deadline
 
     def replace_sensitive_text(self, input_text):
-        # 定义替换规则
-        replacements = {
-            r'公考雷达': os.getenv('APP_NAME', '公考营地'),
-        }
+        return self.sanitizer.replace(input_text)
+
+    def sanitize_article_content(self, content: Union[str, Tag]) -> str:
+        # 已解析的元素直接在原地过滤，无需序列化后再解析一次
+        return self.sanitizer.sanitize(content)
+
+    def extract_article_content(self, driver: webdriver.Chrome):
+        article: WebElement = driver.find_element(By.XPATH, '//div[@class="article-detail"]/article')
+        # TODO: replace attachments' link
+        return self.sanitize_article_content(article.get_attribute('innerHTML'))
 
-        # 生成正则表达式模式
-        pattern = re.compile('|'.join(re.escape(key) for key in replacements.keys()))
+    def fetch_article_page(self, url: str) -> BeautifulSoup:
+        """
+         Download an article detail page over HTTP and check that it has the expected structure.
 
-        # 使用正则表达式替换文本
-        output_text = pattern.sub(lambda x: replacements[x.group(0)], input_text)
+         Args:
+         	 url: URL of the article detail page
 
-        return output_text
+         Returns: 
+         	 The parsed page. Raises ArticleStructureError if the page does not match the structure the extractors expect
+        """
+        response = self.http_session.get(url, timeout=constant.HTTP_TIMEOUT)
+        response.raise_for_status()
+        page = BeautifulSoup(response.content, sanitizer.FAST_HTML_PARSER)
+        if not page.select_one('div[class="article-title"] > h1') \
+                or not page.select_one('.date') \
+                or not page.select_one('div[class="article-detail"] > article'):
+            raise ArticleStructureError(f'URL: {url} - 非标准页面结构')
+        return page
 
-    def extract_article_content(self, driver: webdriver.Chrome):
-        def _should_remove(tag):
-            if '公考雷达' in tag.text:
-                return True
-            if tag.name == 'a' and tag.get('href') and 'www.gongkaoleida.com/search' in tag.get('href'):
+    def process_province_page(self, article_writer: BufferedArticleWriter, driver: webdriver.Chrome, province_name, exam_type, info_type, page_num, start_dt: datetime, end_dt: datetime, trace: Trace = None, work_tab: str = None, list_url: str = None) -> bool:
+        """
+         Scrape the notices of one page of the partition. With work_tab, the list page and the article pages are all
+         loaded into that tab with driver.get, otherwise each of them is opened in a new window that is closed afterwards.
+
+         Returns: 
+         	 True if the page reached notices older than the watermark start_dt, in which case the following pages are older still
+        """
+        trace = trace or self.trace
+        reached_watermark = False
+
+        def _stop(item: dict) -> bool:
+            nonlocal reached_watermark
+            if self.is_date_invalid(item['time'], start_dt, end_dt):
+                # 区分是早于水位还是晚于本次爬取的截止时间
+                reached_watermark = self.parse_notice_date(item['time']) < start_dt
                 return True
             return False
 
-        article: WebElement = driver.find_element(By.XPATH, '//div[@class="article-detail"]/article')
-        # TODO: replace attachments' link
-        content = article.get_attribute('innerHTML')
-        soup = BeautifulSoup(content, 'html.parser')
-
-        # 过滤
-        elements_to_remove = soup.find_all(_should_remove)
-        for element in elements_to_remove:
-            element.extract()
-
-        # 替换敏感信息
-        content = self.replace_sensitive_text(str(soup))
-        return content
-
-    def process_province_page(self, article_manager: ArticleManager, driver: webdriver.Chrome, province_name, exam_type, info_type, page_num, end_dt: datetime):
-        filters={
-            'province': province_name,
-            'exam_type': exam_type,
-            'info_type': info_type,
-        }
-        start_dt: datetime = article_manager.get_max_collect_date(filters) or end_dt - relativedelta(months=3)
         #  Jump to specific page number
-        url = driver.current_url.split('?')[0] + f'?page={page_num}'
-        driver.execute_script(f"window.open('{url}');")
-        province_page_with_pagination = flow.switch_to_lastest_window(driver)
+        url = with_query_params(list_url or driver.current_url.split('?')[0], page=page_num)
+        with trace.timer('open_list_page'):
+            if work_tab:
+                driver.switch_to.window(work_tab)
+                driver.get(url)
+                province_page_with_pagination = work_tab
+            else:
+                driver.execute_script(f"window.open('{url}');")
+                province_page_with_pagination = flow.switch_to_lastest_window(driver)
 
-        @flow.iterate_over_web_elements(
-            driver = driver,
-            selector_value = '.notice-list li',
-            stop = partial(self.is_date_invalid, start_dt=start_dt, end_dt=end_dt)
-        )
-        @flow.operate_in_new_window(
-            driver = driver,
-            initial_page = province_page_with_pagination,
-        )
-        def save_notices():
+        def _new_article(article_title, collect_date_str, apply_deadline, html_content) -> Article:
+            return Article(
+                id=str(uuid.uuid4()),
+                title=article_title,
+                province=province_name,
+                exam_type=exam_type,
+                info_type=info_type,
+                # set the parsed time to local timezone and then convert it to UTC timestamp
+                collect_date=timeutil.local_dt_str_to_utc_ts(collect_date_str),
+                apply_deadline=apply_deadline,
+                apply_deadline_ts=timeutil.deadline_to_ts(apply_deadline),
+                html_content=html_content
+            )
+
+        def save_notice():
             try:
                 article_title = self.extract_article_title(driver).replace('/', '|')
-                if article_manager.check_article_existence_by_title(article_title):
+                if article_title in confirmed_new:
+                    # 列表快照中已确认是新文章，同一页面中重复的标题再次出现时仍会被检查
+                    confirmed_new.discard(article_title)
+                    is_new = True
+                else:
+                    with trace.timer('dedup_check'):
+                        is_new = bool(self.filter_new_titles(article_writer, [article_title]))
+                if is_new:
                     collect_date_str = self.extract_collect_date(driver)
-                    article = Article(
-                        id=str(uuid.uuid4()),
-                        title=article_title,
-                        province=province_name,
-                        exam_type=exam_type,
-                        info_type=info_type,
-                        # set the parsed time to local timezone and then convert it to UTC timestamp
-                        collect_date=timeutil.local_dt_str_to_utc_ts(collect_date_str),
-                        apply_deadline=self.extract_apply_deadline(driver, collect_date_str),
-                        html_content=self.extract_article_content(driver)
-                    )
-                    article_manager.insert_article(article)
-                    self.trace.scraped_articles += 1
+                    apply_deadline = self.extract_apply_deadline(driver, collect_date_str, trace)
+                    with trace.timer('sanitize'):
+                        html_content = self.extract_article_content(driver)
+                    article_writer.write(_new_article(article_title, collect_date_str, apply_deadline, html_content))
+                    trace.scraped_articles += 1
+                else:
+                    trace.incr('duplicate_articles')
             # 页面采集失败，可能是404页面，也可能是非标准结构
             except NoSuchElementException as e:
                 loggers.error_file_logger.error(f"URL: {driver.current_url} - {e.msg}")
 
-        save_notices()
+        def save_page(page: BeautifulSoup, article_title: str):
+            collect_date_str = self.parse_collect_date(page.select_one('.date').decode_contents())
+            apply_deadline = self.extract_apply_deadline_from_page(page, collect_date_str, trace)
+            with trace.timer('sanitize'):
+                html_content = self.sanitize_article_content(page.select_one('div[class="article-detail"] > article'))
+            article_writer.write(_new_article(article_title, collect_date_str, apply_deadline, html_content))
+            trace.scraped_articles += 1
+
+        def save_notice_with_selenium(url: str):
+            with trace.timer('open_article'):
+                if work_tab:
+                    # 列表已经做过快照，可以直接在同一个标签页中打开文章
+                    driver.get(url)
+                else:
+                    driver.execute_script("window.open(arguments[0]);", url)
+                    flow.switch_to_lastest_window(driver)
+            save_notice()
+            if not work_tab:
+                with trace.timer('close_article'):
+                    driver.close()
+                    driver.switch_to.window(province_page_with_pagination)
+
+        notices: List[dict] = []
+
+        @flow.iterate_over_snapshot(
+            driver = driver,
+            selector_value = '.notice-list li',
+            stop = _stop
+        )
+        def collect_notices(item: dict):
+            notices.append(item)
+
+        with trace.timer('list_iteration'):
+            collect_notices()
+        trace.incr('notices', len(notices))
+
+        # 打开文章之前先用列表中的标题去重，已知的标题无需访问
+        def _snapshot_title(item: dict) -> Optional[str]:
+            return item['title'].replace('/', '|') if item['title'] else None
+
+        with trace.timer('dedup_check'):
+            confirmed_new: Set[str] = self.filter_new_titles(article_writer, [t for t in map(_snapshot_title, notices) if t])
+        # 没有标题的条目或标题与详情页不一致时，仍在打开后按详情页标题检查
+        notice_urls = [item['href'] for item in notices if not _snapshot_title(item) or _snapshot_title(item) in confirmed_new]
+        trace.incr('duplicate_articles', len(notices) - len(notice_urls))
+
+        if os.getenv('DETAIL_FETCH_MODE') == constant.HTTP_FETCH_MODE:
+            # 先下载全部详情页，再一次性批量检查标题是否已存在
+            pages = []
+            for notice_url in notice_urls:
+                try:
+                    with trace.timer('fetch_article'):
+                        page = self.fetch_article_page(notice_url)
+                    article_title = self.parse_article_title(str(page.select_one('div[class="article-title"] > h1'))).replace('/', '|')
+                    pages.append((page, article_title))
+                except (requests.RequestException, ArticleStructureError) as e:
+                    # 非标准结构或请求失败的页面回退到Selenium采集
+                    loggers.debug_file_logger.debug(f"HTTP采集失败, 回退到Selenium: {e}")
+                    trace.incr('http_fallbacks')
+                    save_notice_with_selenium(notice_url)
+            page_titles = [article_title for _, article_title in pages]
+            with trace.timer('dedup_check'):
+                new_titles = (set(page_titles) & confirmed_new) | self.filter_new_titles(article_writer, [t for t in page_titles if t not in confirmed_new])
+            trace.incr('duplicate_articles', len(pages) - len(new_titles))
+            for page, article_title in pages:
+                # 同一页面内可能出现重复标题
+                if article_title in new_titles:
+                    new_titles.discard(article_title)
+                    save_page(page, article_title)
+        else:
+            # 列表已经做过快照，逐个打开文章
+            for notice_url in notice_urls:
+                save_notice_with_selenium(notice_url)
+
         # 关闭省份页面
-        if driver.current_window_handle == province_page_with_pagination:
+        if not work_tab and driver.current_window_handle == province_page_with_pagination:
+            with trace.timer('close_list_page'):
+                driver.close()
+        return reached_watermark
+
+    def _find_checkbox(self, driver: webdriver.Chrome, i_class, text):
+        return driver.find_element(By.XPATH, f'//i[contains(@class, "{i_class}")]/following-sibling::a[contains(text(), "{text}")]')
+
+    def _click_checkbox(self, driver: webdriver.Chrome, text, checked=False, timeout=10):
+        # checked: False 代表当前应当处于未点击状态，将执行tick操作， True代表当前应当处于已被点击状态，将执行untick操作
+        target_state = 'unchecked' if checked else 'checked'
+        state = driver.execute_script(CHECKBOX_STATE_SCRIPT, text)
+        if state is None:
+            loggers.error_file_logger.error(f'选项框 {text} 找不到')
+        elif state == target_state:
+            loggers.debug_file_logger.debug(f'选项框 {text} 已经处于{"未" if checked else "已被"}点击状态， 无需额外操作')
+        else:
+            self._find_checkbox(driver, 'icon-oncheck' if checked else 'icon-check', text).click()
+            # 等待勾选状态变化与列表刷新完成，代替固定时长的sleep
+            try:
+                WebDriverWait(driver, timeout).until(lambda d: d.execute_script(CHECKBOX_STATE_SCRIPT, text) == target_state)
+                flow.wait_until_page_ready(driver, timeout)
+            except TimeoutException:
+                # 与之前固定等待的行为一致，超时后继续执行
+                loggers.error_file_logger.error(f'选项框 {text} 在{timeout}秒内未完成{"取消" if checked else ""}勾选')
+
+    def discover_filter_params(self, driver: webdriver.Chrome, options: List[str]):
+        """
+         Learn the URL query parameter of each filter option by ticking it alone once and comparing the URL before and after.
+         The result is kept for the whole run, so later partitions navigate straight to their filtered list URL.
+         If an option does not map to exactly one query parameter, filter_params is set to None and checkbox clicking is used instead.
+
+         Args:
+         	 driver: WebDriver whose current window is a province page with no filter ticked
+         	 options: Texts of the filter options
+        """
+        with self._filter_params_lock:
+            for option in options:
+                if self.filter_params is None:
+                    return
+                if option in self.filter_params:
+                    continue
+                before = set(parse_qsl(urlsplit(driver.current_url).query))
+                self._click_checkbox(driver, option)
+                after = set(parse_qsl(urlsplit(driver.current_url).query))
+                self._click_checkbox(driver, option, checked=True)
+                added = after - before
+                if len(added) != 1:
+                    loggers.debug_file_logger.debug(f'选项框 {option} 的筛选条件不在URL查询参数中, 使用点击方式筛选')
+                    self.filter_params = None
+                    return
+                self.filter_params[option] = added.pop()
+
+    def _apply_filters(self, driver: webdriver.Chrome, province_url: str, ticked: dict, info_type: str, exam_type: str, filter_params: Optional[Dict[str, Tuple[str, str]]] = None) -> str:
+        """
+         Show the list of the province filtered by info_type and exam_type, and return the URL to paginate.
+         ticked records the options currently ticked on the page when filtering by clicking.
+         filter_params is the copy of self.filter_params taken for the province, None to filter by clicking.
+        """
+        if filter_params:
+            # 直接打开筛选后的列表页
+            info_param, exam_param = filter_params[info_type], filter_params[exam_type]
+            if info_param[0] == exam_param[0]:
+                # 两个筛选项使用同一个参数名时, 无法通过字典合并
+                list_url = f'{province_url}{"&" if "?" in province_url else "?"}{urlencode([info_param, exam_param])}'
+            else:
+                list_url = with_query_params(province_url, **dict([info_param, exam_param]))
+            driver.get(list_url)
+            return list_url
+
+        # 先勾选新的选项, 再取消勾选上次遗留的选项
+        for key, option in (('info_type', info_type), ('exam_type', exam_type)):
+            if ticked.get(key) != option:
+                self._click_checkbox(driver, option)
+                if ticked.get(key):
+                    self._click_checkbox(driver, ticked[key], checked=True)
+                ticked[key] = option
+        return driver.current_url.split('?')[0]
+
+    def scrape_province(self, driver: webdriver.Chrome, trace: Trace, province_name: str, end_dt: datetime, article_writer: BufferedArticleWriter):
+        """
+         Scrape every info type / exam type / page of the province page opened in the current window.
+
+         Args:
+         	 driver: WebDriver whose current window is the province detail page
+         	 trace: Trace that records the progress of this province
+         	 province_name: Name of the province
+         	 end_dt: Upper bound of the collect date of the articles to be scraped
+         	 article_writer: Writer through which the scraped articles are stored
+        """
+        province_page = driver.current_window_handle
+        # 单标签页模式下，列表页和文章页都在同一个工作标签页中打开
+        work_tab = None
+        if os.getenv('NAVIGATION_MODE') == constant.SINGLE_TAB_NAVIGATION:
+            driver.switch_to.new_window('tab')
+            work_tab = driver.current_window_handle
+            self.block_resources(driver)
+            driver.switch_to.window(province_page)
+
+        province_url = driver.current_url
+        info_types: List[str] = driver.find_element(By.XPATH, '//dt[contains(text(),"资讯类型")]/following-sibling::dd/ul').text.split()
+        num_of_info_types = len(info_types)
+        exam_types: List[str] = driver.find_element(By.XPATH, '//dt[contains(text(),"考试类型")]/following-sibling::dd/ul').text.split()
+        num_of_exam_types = len(exam_types)
+        self.discover_filter_params(driver, info_types + exam_types)
+        # 整个省份使用同一份筛选参数，其他worker在此期间改为点击方式时不受影响
+        with self._filter_params_lock:
+            filter_params = dict(self.filter_params) if self.filter_params else None
+        # 点击方式筛选时当前已勾选的选项
+        ticked = {}
+
+        for a_i in range(num_of_info_types):
+            current_info_type = info_types[a_i]
+            if all(Trace.partition_key(province_name, current_info_type, e) in trace.finished_partitions for e in exam_types):
+                loggers.debug_file_logger.debug(f"跳过资讯类型: {current_info_type}")
+                continue
+            else:
+                # 记录 info_type
+                trace.info_type = current_info_type
+
+            for i in range(num_of_exam_types):
+                current_exam_type = exam_types[i]
+                partition = Trace.partition_key(province_name, current_info_type, current_exam_type)
+                if partition in trace.finished_partitions:
+                    loggers.debug_file_logger.debug(f"跳过考试类型: {current_exam_type}")
+                    continue
+                else:
+                    # 记录 exam_type
+                    trace.exam_type = current_exam_type
+
+                with trace.timer('apply_filters'):
+                    list_url = self._apply_filters(driver, province_url, ticked, current_info_type, current_exam_type, filter_params)
+                start_dt = self.get_partition_watermark(article_writer.article_manager, trace, province_name, current_info_type, current_exam_type, end_dt)
+                # Get the total number of pages
+                # 只有一页时没有分页栏，无需等待隐式等待超时
+                with flow.no_implicit_wait(driver):
+                    last_page = driver.find_elements(By.XPATH, '//li[a[text()="下一页"]]/preceding-sibling::li[1]')
+                totalPages = int(last_page[0].text) if last_page else 1
+                if os.getenv('RUNNING_ENV') == constant.TEST_ENV:
+                    totalPages = min(totalPages, 3)
+                # 处理每个分页，重启后从未完成的页码继续
+                for j in range(trace.finished_pages.get(partition, 0) + 1, totalPages + 1):
+                    reached_watermark = self.process_province_page(article_writer, driver, province_name, current_exam_type, current_info_type, j, start_dt, end_dt, trace, work_tab, list_url)
+                    driver.switch_to.window(province_page)
+                    trace.finish_page(partition, j)
+                    # 缓冲区中还有文章时，等写入后再保存检查点
+                    if not article_writer.has_pending():
+                        trace.save()
+                    # 列表按日期倒序，之后的页面只会更旧
+                    if reached_watermark:
+                        trace.skipped_pages += totalPages - j
+                        loggers.debug_file_logger.debug(f"{partition} 第{j}页已早于水位, 跳过剩余的{totalPages - j}页")
+                        break
+                trace.finish_partition(partition)
+                if not article_writer.has_pending():
+                    trace.save()
+
+        if work_tab:
+            driver.switch_to.window(work_tab)
             driver.close()
+            driver.switch_to.window(province_page)
+
+        # 记录已经爬过的省份
+        trace.finish_province(province_name)
+        article_writer.flush()
+        trace.save()
 
     def scrape_website(self):
+        self.warm_seen_titles(UnicloudDBArticleManager())
         driver = self._create_chrome_web_driver(headless=os.getenv('HEADLESS_MODE'))
-
-        def _find_checkbox(i_class, text):
-            return driver.find_element(By.XPATH, f'//i[contains(@class, "{i_class}")]/following-sibling::a[contains(text(), "{text}")]')
-            
-        def _click_checkbox(text, checked=False, interval=3):
-            # checked: False 代表当前应当处于未点击状态，将执行tick操作， True代表当前应当处于已被点击状态，将执行untick操作
-            try:
-                checkbox = _find_checkbox('icon-oncheck' if checked else 'icon-check', text)
-                checkbox.click()
-                time.sleep(interval)
-            except NoSuchElementException as e1:
-                try:
-                    _find_checkbox('icon-check' if checked else 'icon-oncheck', text)
-                    loggers.debug_file_logger.debug(f'选项框 {text} 已经处于{"未" if checked else "已被"}点击状态， 无需额外操作')
-                except Exception as e2:
-                    loggers.error_file_logger.error(f'选项框 {text} 找不到, {e2.msg}')            
+        article_writer = self.create_article_writer(UnicloudDBArticleManager(), self.trace)
 
         try:
-            driver.get('https://www.gongkaoleida.com/')
+            driver.get(HOMEPAGE_URL)
             homepage = driver.current_window_handle
             end_dt: datetime = timeutil.localize_native_dt(datetime.now())
 
             # Iterate over all the provinces
-            @flow.iterate_over_web_elements(
+            @flow.iterate_over_snapshot(
                 driver = driver,
                 selector_value = '.province-name',
-                filter = lambda e: e.text not in self.trace.province if self.trace.scrape_times > 1 else True # 重启后略过已经爬过的省份
+                filter = lambda item: item['text'] not in self.trace.province # 重启后略过已经爬过的省份
             )
-            def iterate_over_all_provinces(web_element: WebElement):
-                province_name = web_element.text
-                web_element.click()
+            def iterate_over_all_provinces(item: dict):
+                province_name = item['text']
+                if item['href']:
+                    driver.execute_script("window.open(arguments[0]);", item['href'])
+                else:
+                    driver.find_elements(By.CSS_SELECTOR, '.province-name')[item['index']].click()
 
                 # switch to the province detail page
-                province_page = flow.switch_to_lastest_window(driver)
-                
-                info_types: List[str] = driver.find_element(By.XPATH, '//dt[contains(text(),"资讯类型")]/following-sibling::dd/ul').text.split()
-                num_of_info_types = len(info_types)
-                exam_types: List[str] = driver.find_element(By.XPATH, '//dt[contains(text(),"考试类型")]/following-sibling::dd/ul').text.split()
-                num_of_exam_types = len(exam_types)
-
-                for a_i in range(num_of_info_types):
-                    current_info_type = info_types[a_i]
-                    if self.trace.scrape_times > 1 and self.trace.info_type and a_i < info_types.index(self.trace.info_type):
-                        loggers.debug_file_logger.debug(f"跳过资讯类型: {current_info_type}")
-                        continue
-                    else:
-                        # 记录 info_type
-                        self.trace.info_type = current_info_type
-
-                    _click_checkbox(current_info_type)
-                    # 取消勾选上个循环遗留下的checkboxes
-                    if a_i > 0:
-                        _click_checkbox(exam_types[-1], checked=True)
-                        _click_checkbox(info_types[a_i-1], checked=True)
-
-                    for i in range(num_of_exam_types):
-                        current_exam_type = exam_types[i]
-                        if self.trace.scrape_times > 1 and self.trace.exam_type and i < exam_types.index(self.trace.exam_type):
-                            loggers.debug_file_logger.debug(f"跳过考试类型: {current_exam_type}")
-                            continue
-                        else:
-                            # 记录 exam_type
-                            self.trace.exam_type = current_exam_type
-                            # 重置 exam_type 以防止下个info_type循环跳过最后一个exam_type之前的所有exam_type
-                            if i == num_of_exam_types - 1:
-                                self.trace.exam_type = ''
-
-                        _click_checkbox(current_exam_type)
-                        # 取消勾选上个循环遗留下的checkbox
-                        if i > 0:
-                            _click_checkbox(exam_types[i-1], checked=True)
-
-                        # Get the total number of pages
-                        try:
-                            totalPages = int(driver.find_element(By.XPATH, '//li[a[text()="下一页"]]/preceding-sibling::li[1]').text)
-                        except NoSuchElementException:
-                            totalPages = 1
-                        if os.getenv('RUNNING_ENV') == constant.TEST_ENV:
-                            totalPages = min(totalPages, 3)
-                        # 处理每个分页
-                        for j in range(1, totalPages + 1):
-                            self.process_province_page(UnicloudDBArticleManager(), driver, province_name, current_exam_type, current_info_type, j, end_dt)
-                            driver.switch_to.window(province_page)
-
-                # 记录已经爬过的省份
-                self.trace.province.add(province_name)
+                flow.switch_to_lastest_window(driver)
+                self.scrape_province(driver, self.trace, province_name, end_dt, article_writer)
+
                 # 关闭新窗口并切换回原始窗口
                 driver.close()
                 driver.switch_to.window(homepage)
             
             iterate_over_all_provinces()
-            loggers.debug_file_logger.debug(f"成功完成本次爬取任务! 总共爬取了{self.trace.scrape_times}个文章")
+            article_writer.flush()
+            self.trace.discard()
+            loggers.debug_file_logger.debug(f"成功完成本次爬取任务! 总共爬取了{self.trace.scraped_articles}个文章, 跳过了{self.trace.skipped_pages}个早于水位的分页, 导航模式: {os.getenv('NAVIGATION_MODE', 'window')}, 耗时: {self.trace.timing_summary()}")
+            return True
         except WebDriverException as e:
             if self.trace.scrape_times <= 3 and "no such execution context" in e.msg:
                 self.trace.scrape_times += 1
                 loggers.error_file_logger.error(f"{e}, 即将开始第{self.trace.scrape_times}次爬取..., 当前trace: {self.trace}")
-                self.scrape_website()
+                # 重新开始前先写入缓冲区中的文章，重新爬取时才能识别这些标题，检查点也不会在之后被覆盖
+                article_writer.close()
+                return self.scrape_website()
             else:
                 loggers.error_file_logger.error(f"{e.msg}, 当前trace: {self.trace}, 异常退出")
         except Exception as e:
-            loggers.error_file_logger.error(f"{e.msg}, 当前trace: {self.trace}, 异常退出")
+            loggers.error_file_logger.error(f"{e}, 当前trace: {self.trace}, 异常退出")
+        finally:
+            article_writer.close()
+            driver.quit()
+        return False
+
+    def _quit_driver(self, driver: webdriver.Chrome):
+        # driver 失效时 quit 也会失败，此时只记录日志，worker 的trace仍需返回并合并
+        try:
+            driver.quit()
+        except Exception as e:
+            loggers.error_file_logger.error(f"关闭driver失败: {e}")
+
+    def _close_extra_windows(self, driver: webdriver.Chrome):
+        # 只保留第一个窗口，保证下一个省份从干净的状态开始
+        for handle in driver.window_handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(driver.window_handles[0])
+
+    def _open_province_page(self, driver: webdriver.Chrome, province_name: str, province_url: str = None):
+        # 点击进入的省份会打开新窗口，先关闭上一个省份留下的窗口
+        self._close_extra_windows(driver)
+        if province_url:
+            driver.get(province_url)
+            return
+        # 省份入口没有链接时，从首页点击进入
+        driver.get(HOMEPAGE_URL)
+        driver.find_element(By.XPATH, f'//*[contains(@class, "province-name") and text()="{province_name}"]').click()
+        flow.switch_to_lastest_window(driver)
+
+    def _province_worker(self, provinces: Queue, end_dt: datetime, worker_index: int) -> Trace:
+        # 每个worker拥有独立的driver和trace，从队列中领取省份直到队列为空
+        trace = Trace(
+            checkpoint_path=f'{self.trace.checkpoint_path}.{worker_index}' if self.trace.checkpoint_path else '',
+            # 继承恢复出来的分区进度
+            finished_partitions=set(self.trace.finished_partitions),
+            finished_pages=dict(self.trace.finished_pages),
+            watermarks=dict(self.trace.watermarks),
+        )
+        driver = self._create_chrome_web_driver(headless=os.getenv('HEADLESS_MODE'))
+        article_writer = self.create_article_writer(UnicloudDBArticleManager(), trace)
+        try:
+            while True:
+                try:
+                    province_name, province_url = provinces.get_nowait()
+                except Empty:
+                    break
+                try:
+                    self._open_province_page(driver, province_name, province_url)
+                    self.scrape_province(driver, trace, province_name, end_dt, article_writer)
+                except Exception as e:
+                    # 单个省份失败不影响其他省份，未完成的省份不会记入trace，下次爬取时继续
+                    loggers.error_file_logger.error(f"省份 {province_name} 爬取失败: {e}, 当前trace: {trace}")
+                    try:
+                        self._close_extra_windows(driver)
+                    except Exception as e:
+                        # driver 已经失效（浏览器崩溃时可能是连接错误而不是 WebDriverException），重新创建
+                        loggers.error_file_logger.error(f"清理窗口失败, 重新创建driver: {e}")
+                        self._quit_driver(driver)
+                        driver = self._create_chrome_web_driver(headless=os.getenv('HEADLESS_MODE'))
+        finally:
+            article_writer.close()
+            self._quit_driver(driver)
+        return trace
+
+    def _restore_worker_checkpoints(self):
+        # 将上次并行爬取中各worker的检查点合并进来
+        if not self.trace.checkpoint_path:
+            return
+        worker_traces = [Trace.load(path) for path in glob.glob(f'{glob.escape(self.trace.checkpoint_path)}.*') if not path.endswith('.tmp')]
+        for worker_trace in worker_traces:
+            self.trace.merge(worker_trace)
+        # 先保存合并后的检查点，再删除worker的检查点
+        self.trace.save()
+        for worker_trace in worker_traces:
+            worker_trace.discard()
+
+    def scrape_website_in_parallel(self, num_of_workers: int = 4):
+        """
+         Scrape the website with a pool of Chrome drivers, each worker owns one province at a time.
+
+         Args:
+         	 num_of_workers: Number of Chrome drivers running concurrently
+        """
+        self.warm_seen_titles(UnicloudDBArticleManager())
+        self._restore_worker_checkpoints()
+        driver = self._create_chrome_web_driver(headless=os.getenv('HEADLESS_MODE'))
+        try:
+            driver.get(HOMEPAGE_URL)
+            provinces = Queue()
+            province_names = []
+            for item in flow.snapshot_elements(driver, '.province-name'):
+                province_names.append(item['text'])
+                # 重启后略过已经爬过的省份
+                if item['text'] not in self.trace.province:
+                    provinces.put((item['text'], item['href']))
         finally:
             driver.quit()
 
+        end_dt: datetime = timeutil.localize_native_dt(datetime.now())
+        with ThreadPoolExecutor(max_workers=num_of_workers) as executor:
+            worker_traces = list(executor.map(lambda i: self._province_worker(provinces, end_dt, i), range(num_of_workers)))
+        for worker_trace in worker_traces:
+            self.trace.merge(worker_trace)
+        self.trace.save()
+        for worker_trace in worker_traces:
+            worker_trace.discard()
+        finished = provinces.empty() and all(province in self.trace.province for province in province_names)
+        if finished:
+            self.trace.discard()
+        loggers.debug_file_logger.debug(f"成功完成本次并行爬取任务! 总共爬取了{self.trace.scraped_articles}个文章, 跳过了{self.trace.skipped_pages}个早于水位的分页, 导航模式: {os.getenv('NAVIGATION_MODE', 'window')}, 耗时: {self.trace.timing_summary()}, 当前trace: {self.trace}")
+        return finished
+
 if __name__ == "__main__":
     load_dotenv()
-    # trace = Trace(province={'国家', '安徽'}, exam_type='银行', info_type='招考公告', scrape_times=2)
-    trace = Trace()
-    GkldCrawler(trace).scrape_website()
\ No newline at end of file
+    # 存在检查点时从上次中断的分区继续
+    trace = Trace.load(os.getenv('CRAWL_CHECKPOINT_PATH', './data/checkpoint.json'))
+    num_of_workers = int(os.getenv('CRAWLER_WORKERS', 1))
+    started_at = timeutil.localize_native_dt(datetime.now())
+    status = 'interrupted'
+    try:
+        if num_of_workers > 1:
+            finished = GkldCrawler(trace).scrape_website_in_parallel(num_of_workers)
+        else:
+            finished = GkldCrawler(trace).scrape_website()
+        status = 'finished' if finished else 'failed'
+    finally:
+        # 每次运行的各阶段耗时与计数写入单独的汇总文件
+        summary_path = trace.write_run_summary(os.getenv('RUN_SUMMARY_DIR', './data/runs'), started_at, status)
+        loggers.debug_file_logger.debug(f"本次运行汇总已写入 {summary_path}")
@@ -1,28 +1,63 @@
 import json
 import os
-import requests
-from models.article import Article, ArticleManager
+from models.article import Article, ArticleInsertError, ArticleManager
 from datetime import datetime
-from typing import Union
+from typing import Iterator, List, Set, Union
 
-from utilities import Singleton, loggers, timeutil
+from utilities import Singleton, chunked, httpclient, loggers, timeutil
 
 @Singleton
 class UnicloudDBArticleManager(ArticleManager):
 
     def check_article_existence_by_title(self, article_title) -> bool:
-        check_res = requests.get(os.getenv('UNI_APP_CLOUD_DB_SEARCH'), params={'query': f'title=="{article_title}"'})
+        check_res = httpclient.get_session().get(os.getenv('UNI_APP_CLOUD_DB_SEARCH'), params={'query': f'title=="{article_title}"'})
         if check_res.status_code == 200:
             data = json.loads(check_res.text)
             not_found = data['affectedDocs'] == 0
             return not_found
 
+    def get_existing_titles(self, article_titles: List[str]) -> Set[str]:
+        existing_titles = set()
+        for chunk in chunked(article_titles, 50):
+            query = f'title in {json.dumps(chunk, ensure_ascii=False)}'
+            check_res = httpclient.get_session().get(os.getenv('UNI_APP_CLOUD_DB_SEARCH'), params={'query': query})
+            check_res.raise_for_status()
+            data = json.loads(check_res.text)
+            existing_titles.update(doc['title'] for doc in data.get('data', []))
+        return existing_titles
+
+    def iterate_articles(self, batch_size: int = 1000) -> Iterator[Article]:
+        # 需要部署按 skip/limit 分页返回文章的云函数
+        url = os.getenv('UNI_APP_CLOUD_DB_LIST_ARTICLES_URL')
+        if not url:
+            raise NotImplementedError('UNI_APP_CLOUD_DB_LIST_ARTICLES_URL is not configured')
+        skip = 0
+        while True:
+            res = httpclient.get_session().get(url, params={'skip': skip, 'limit': batch_size})
+            res.raise_for_status()
+            docs = json.loads(res.text).get('data', [])
+            for doc in docs:
+                yield Article.model_validate(doc)
+            if len(docs) < batch_size:
+                break
+            skip += batch_size
+
     def insert_article(self, article: Article) -> None:
-        insert_res = requests.post(os.getenv('UNI_APP_CLOUD_DB_INSERT_ARTICLE_URL'), json=article.model_dump())
-        if insert_res.status_code == 200:
-            loggers.debug_file_logger.debug(json.loads(insert_res.text)['data']['message'])
+        insert_res = httpclient.get_session().post(os.getenv('UNI_APP_CLOUD_DB_INSERT_ARTICLE_URL'), json=article.model_dump())
+        if insert_res.status_code != 200:
+            raise ArticleInsertError(f"插入文章{article.title}失败: {insert_res.status_code} {insert_res.text}")
+        loggers.debug_file_logger.debug(json.loads(insert_res.text)['data']['message'])
+
+    def insert_articles(self, articles: List[Article]) -> None:
+        # 未配置批量插入的云函数时退回逐个插入
+        if not os.getenv('UNI_APP_CLOUD_DB_INSERT_ARTICLES_URL'):
+            return super().insert_articles(articles)
+        insert_res = httpclient.get_session().post(os.getenv('UNI_APP_CLOUD_DB_INSERT_ARTICLES_URL'), json=[article.model_dump() for article in articles])
+        if insert_res.status_code != 200:
+            raise ArticleInsertError(f"批量插入{len(articles)}篇文章失败: {insert_res.status_code} {insert_res.text}")
+        loggers.debug_file_logger.debug(json.loads(insert_res.text)['data']['message'])
 
     def get_max_collect_date(self, filters: dict={}) -> Union[datetime, None]:
-        res = requests.get(os.getenv('UNI_APP_CLOUD_DB_MAX_COLLECT_DATE_URL'), params=filters)
+        res = httpclient.get_session().get(os.getenv('UNI_APP_CLOUD_DB_MAX_COLLECT_DATE_URL'), params=filters)
         data = json.loads(res.text)
         return timeutil.localize_native_dt(datetime.fromtimestamp(data['data']['max_collect_date'])) if data['success'] else None
\ No newline at end of file
@@ -1,7 +1,11 @@
+from contextlib import nullcontext
 from datetime import datetime
-from typing import Optional, Union
+import threading
+import time
+from typing import Callable, ContextManager, Iterator, List, Optional, Set, Union
 from pydantic import BaseModel
 from abc import ABC, abstractmethod
+from utilities import loggers
 
 class Article(BaseModel):
     id: str
@@ -11,7 +15,19 @@ class Article(BaseModel):
     info_type: str
     collect_date: float  # numeric UNIX timestamp
     apply_deadline: Optional[str]
-    html_content: str
+    # apply_deadline 对应的UTC时间戳，无法解析时为 None
+    apply_deadline_ts: Optional[float] = None
+    # 写入搜索索引时分配的递增序号，用于稳定的分页
+    seq: Optional[int] = None
+    # 从搜索索引读取的文章不包含正文
+    html_content: Optional[str] = None
+
+class ArticleInsertError(Exception):
+    """文章未能写入存储，inserted 为失败前已经写入的文章"""
+
+    def __init__(self, message: str, inserted: List[Article] = None):
+        super().__init__(message)
+        self.inserted = inserted or []
 
 class ArticleManager(ABC):
 
@@ -19,10 +35,122 @@ class ArticleManager(ABC):
     def check_article_existence_by_title(self, article_title: str) -> bool:
         pass    
 
+    def get_existing_titles(self, article_titles: List[str]) -> Set[str]:
+        # 默认逐个查询，子类可以重写为批量查询
+        return {t for t in article_titles if not self.check_article_existence_by_title(t)}
+
+    def iterate_titles(self) -> Iterator[str]:
+        # 默认不支持遍历存储中的全部标题
+        return iter(())
+
+    def iterate_articles(self, batch_size: int = 1000) -> Iterator[Article]:
+        # 遍历存储中的全部文章，用于重建索引；不支持时抛出异常，避免重建出空索引
+        raise NotImplementedError(f'{type(self).__name__} does not support iterating over articles')
+
     @abstractmethod
     def insert_article(self, article: Article) -> None:
         pass
     
+    def insert_articles(self, articles: List[Article]) -> None:
+        # 默认逐个插入，子类可以重写为批量插入；失败时记录已写入的文章，这些文章不会被重复写入
+        for i, article in enumerate(articles):
+            try:
+                self.insert_article(article)
+            except Exception as e:
+                raise ArticleInsertError(str(e), inserted=articles[:i]) from e
+
     @abstractmethod
     def get_max_collect_date(self, filters: dict={}) -> Union[datetime, None]:
-        pass
\ No newline at end of file
+        pass
+
+class BufferedArticleWriter(object):
+    """
+     Buffer articles in memory and write them to the article manager in batches.
+
+     The buffer is flushed when it reaches batch_size, when flush_interval seconds have passed
+     since the last flush, and when the writer is closed.
+    """
+
+    def __init__(self,
+        article_manager: ArticleManager,
+        batch_size: int = 50,
+        flush_interval: float = 30,
+        on_flushed: Callable[[List[Article]], None] = lambda _: None,
+        timer: Callable[[str], ContextManager] = None,
+    ):
+        self.article_manager = article_manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flushed = on_flushed
+        # 按阶段名返回计时的上下文管理器，用于统计写入耗时
+        self.timer = timer or (lambda _: nullcontext())
+        self._buffer: List[Article] = []
+        self._lock = threading.RLock()
+        self._last_flush = time.monotonic()
+        self._closed = threading.Event()
+        # 后台线程定时刷新，避免爬取较慢时文章长时间停留在缓冲区
+        self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._timer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                # 写入失败的文章留在缓冲区中，下次刷新时重试，线程不能因异常退出
+                try:
+                    self.flush()
+                except Exception as e:
+                    loggers.error_file_logger.error(f"定时写入文章失败: {e}")
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return bool(self._buffer)
+
+    def is_pending(self, article_title: str) -> bool:
+        with self._lock:
+            return any(a.title == article_title for a in self._buffer)
+
+    def write(self, article: Article) -> None:
+        with self._lock:
+            self._buffer.append(article)
+            if len(self._buffer) >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """
+         Write the buffered articles. They are removed from the buffer, and passed to on_flushed, only once stored,
+         so a failed write raises and leaves them in the buffer for the next flush.
+        """
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._buffer:
+                return
+            articles = list(self._buffer)
+            try:
+                with self.timer('insert'):
+                    self.article_manager.insert_articles(articles)
+            except ArticleInsertError as e:
+                # 已经写入的部分不再重试
+                if e.inserted:
+                    del self._buffer[:len(e.inserted)]
+                    self.on_flushed(e.inserted)
+                raise
+            # 持有锁期间缓冲区不会增加，前 len(articles) 篇即本次写入的文章
+            del self._buffer[:len(articles)]
+            self.on_flushed(articles)
+
+    def close(self) -> None:
+        # 重复调用时不再写入，关闭之后的 on_flushed 不会再被触发
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        try:
+            self.flush()
+        except Exception as e:
+            # 未写入的文章没有记入标题索引与检查点，下次爬取时会重新采集
+            loggers.error_file_logger.error(f"关闭时仍有{len(self._buffer)}篇文章未能写入: {e}")
@@ -1,26 +1,111 @@
+import asyncio
+import base64
 from datetime import datetime
-from typing import Union
-from models.article import Article, ArticleManager
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+from models.article import Article, ArticleInsertError, ArticleManager
 from search_engine.meilisearch.manager import IndexManager
-from utilities import Singleton, timeutil
+from utilities import Singleton, chunked, loggers, timeutil
+from utilities.cache import GenerationCounter, TTLCache
+from utilities.contentstore import get_content_store
+
+_MISSING = object()
+SEARCH_PAGE_SIZE = 20
+
+# 索引中只保存元数据，html_content 保存在本地的内容存储中
+METADATA_FIELDS = ['id', 'title', 'province', 'exam_type', 'info_type', 'collect_date', 'apply_deadline', 'apply_deadline_ts', 'seq']
+DEFAULT_SORT = 'collect_date:desc'
+# 可供客户端选择的排序方式
+SORT_OPTIONS = {DEFAULT_SORT, 'apply_deadline_ts:asc', 'apply_deadline_ts:desc'}
+# 前端展示计数的筛选维度
+FACET_FIELDS = ['province', 'exam_type', 'info_type']
+
+ARTICLE_INDEX_SETTINGS = {
+    'searchableAttributes': ['title', 'province', 'exam_type', 'info_type'],
+    'filterableAttributes': ['title', 'province', 'exam_type', 'info_type', 'collect_date', 'apply_deadline', 'apply_deadline_ts', 'seq'],
+    'sortableAttributes': ['collect_date', 'id', 'apply_deadline_ts', 'seq'],
+    'rankingRules':[
+        "exactness",
+        "words",
+        "typo",
+        "proximity",
+        "attribute",
+        "sort",
+    ],
+}
+
+def quote_filter_value(value: str) -> str:
+    # 转义过滤表达式中的反斜杠与双引号
+    escaped = value.replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+def encode_cursor(position: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode()
+
+def decode_cursor(cursor: str) -> dict:
+    # 非法的cursor抛出 ValueError
+    position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(position, dict):
+        raise ValueError(f'Invalid cursor {cursor}')
+    return position
+
+_seq_lock = threading.Lock()
+_last_seq = 0
+
+def next_seq() -> int:
+    # 以微秒为单位的写入时间，同一进程内严格递增
+    global _last_seq
+    with _seq_lock:
+        _last_seq = max(time.time_ns() // 1000, _last_seq + 1)
+        return _last_seq
+
+def to_document(article: Article) -> dict:
+    # 正文保存在内容存储中，不写入索引；首次写入索引时分配 seq，重建索引时保留原值
+    document = article.model_dump(exclude={'html_content'})
+    if document.get('seq') is None:
+        document['seq'] = next_seq()
+    return document
+
+def build_filter(start_date: float = None, end_date: float = None, filters: dict={}, deadline_from: float = None, deadline_to: float = None) -> list:
+    # construct filter array
+    filter = []
+    for key, value in filters.items():
+        if isinstance(value, list):
+            filter.append([f'{key}={v}' for v in value])
+        else:
+            filter.append(f'{key}={value}')
+    if end_date:
+        filter.append(f'collect_date <= {end_date}')
+    if start_date:
+        filter.append(f'collect_date >= {start_date}')
+    if deadline_from is not None:
+        filter.append(f'apply_deadline_ts >= {deadline_from}')
+    if deadline_to is not None:
+        filter.append(f'apply_deadline_ts <= {deadline_to}')
+    return filter
 
 @Singleton
 class MeiliSearchArticleManager(ArticleManager, IndexManager):
 
     def __init__(self):
         super().__init__('articles')
-        self.index.update_settings({
-            'filterableAttributes': ['title', 'province', 'exam_type', 'info_type', 'collect_date', 'apply_deadline'],
-            'sortableAttributes': ['collect_date'],
-            'rankingRules':[
-                "exactness",
-                "words",
-                "typo",
-                "proximity",
-                "attribute",
-                "sort",
-            ],
-        })
+        # 设置与期望一致时不再提交设置任务，避免每次启动都触发重建索引
+        self.sync_settings(ARTICLE_INDEX_SETTINGS)
+        # 热门筛选条件的搜索结果缓存，爬虫写入新文章时通过递增代数使其失效
+        self.search_cache = TTLCache(
+            maxsize=int(os.getenv('SEARCH_CACHE_MAXSIZE', 1024)),
+            ttl=float(os.getenv('SEARCH_CACHE_TTL', 60)),
+        )
+        self.search_generation = GenerationCounter(os.getenv('SEARCH_CACHE_GENERATION_PATH', './data/search_generation'))
+        # (代数, 未筛选的各维度计数)，启动时预先计算
+        self.facet_totals: Optional[Tuple[int, Dict[str, Dict[str, int]]]] = None
+        try:
+            self.refresh_facet_totals()
+        except Exception as e:
+            loggers.error_file_logger.error(f"预先计算筛选计数失败: {e}")
     
     def get_max_collect_date(self, filters: dict={}) -> Union[datetime, None]:
         r: dict = self.index.search(
@@ -34,37 +119,261 @@ class MeiliSearchArticleManager(ArticleManager, IndexManager):
         )
         return timeutil.localize_native_dt(datetime.fromtimestamp(r['hits'][0]['collect_date'])) if r['hits'] else None
 
-    def search_articles(self, query: str, page: Union[str, int], start_date: float = None, end_date: float = None, filters: dict={}):
+    def build_search_params(self, query: str, page: Union[str, int], start_date: float = None, end_date: float = None, filters: dict={}, cursor: str = None,
+                            deadline_from: float = None, deadline_to: float = None, sort: str = None) -> dict:
         # construct pagination params
-        limit = 20
+        limit = SEARCH_PAGE_SIZE
         offset = (int(page) - 1) * limit
-        # construct filter array
-        filter = []
-        for key, value in filters.items():
-            if isinstance(value, list):
-                filter.append([f'{key}={v}' for v in value])
-            else:
-                filter.append(f'{key}={value}')
         if not end_date:
             end_date = datetime.now().timestamp()
-        filter.append(f'collect_date <= {end_date}')
-        if start_date:
-            filter.append(f'collect_date >= {start_date}')
-        # construct Chinese tokens
-        r: dict = self.index.search(
-            query = query,
-            opt_params = {
-                'offset': offset,
-                'limit': limit,
-                'filter': filter,
-                'sort': ['collect_date:desc'],
-                'attributesToRetrieve': ['id', 'title', 'province', 'exam_type', 'info_type', 'apply_deadline'],
-            }
+        filter = build_filter(start_date, end_date, filters, deadline_from, deadline_to)
+        sort = sort or DEFAULT_SORT
+        if sort not in SORT_OPTIONS:
+            raise ValueError(f'Invalid sort {sort}')
+        if cursor:
+            position = decode_cursor(cursor)
+            if 'seq' not in position and 'offset' not in position:
+                raise ValueError(f'Invalid cursor {cursor}')
+            if 'seq' in position:
+                if sort != DEFAULT_SORT:
+                    raise ValueError(f'Cursor {cursor} does not match sort {sort}')
+                # 只返回排在上一页最后一篇文章之后的文章，之后写入的文章 seq 更大，不会影响后续分页
+                # 尚未回填 seq 的文章排在同一天的最后，也在上一页之后
+                collect_date, seq = float(position['collect_date']), int(position['seq'])
+                filter.append(f'(collect_date < {collect_date} OR (collect_date = {collect_date} AND (seq < {seq} OR seq NOT EXISTS)))')
+            offset = int(position.get('offset', 0))
+        return {
+            'q': query,
+            'offset': offset,
+            'limit': limit,
+            'filter': filter,
+            'sort': [sort, 'seq:desc'] if sort == DEFAULT_SORT else [sort, 'id:asc'],
+            'attributesToRetrieve': METADATA_FIELDS,
+        }
+
+    def build_next_cursor(self, search_params: dict, hits: List[dict], cursor: str = None) -> Optional[str]:
+        """
+         Build the opaque cursor of the page following hits.
+
+         Without a query the results are ordered by (collect_date, seq) descending, where seq is unique and increases with
+         every insert, so the cursor records both values of the last hit and the next page is fetched with a keyset filter.
+         Articles inserted meanwhile have a larger seq and never shift the following pages.
+         With a query, with another sort, or when the last hit has no seq yet (see backfill), the cursor falls back to an offset,
+         kept relative to the keyset of the previous cursor if any.
+        """
+        if len(hits) < search_params['limit']:
+            return None
+        last_hit = hits[-1]
+        if not search_params['q'].strip() and search_params['sort'][0] == DEFAULT_SORT and last_hit.get('seq') is not None:
+            return encode_cursor({'collect_date': last_hit['collect_date'], 'seq': last_hit['seq']})
+        position = decode_cursor(cursor) if cursor else {}
+        next_position = {key: position[key] for key in ('collect_date', 'seq') if key in position}
+        next_position['offset'] = search_params['offset'] + len(hits)
+        return encode_cursor(next_position)
+
+    def search_cache_key(self, query: str, page: Union[str, int], start_date: float = None, end_date: float = None, filters: dict={}, cursor: str = None,
+                         deadline_from: float = None, deadline_to: float = None, sort: str = None) -> str:
+        # 筛选值的顺序不影响结果
+        normalized_filters = {key: sorted(value) if isinstance(value, list) else value for key, value in filters.items()}
+        return json.dumps(
+            [self.search_generation.current(), query.strip(), int(page), start_date, end_date, normalized_filters, cursor, deadline_from, deadline_to, sort or DEFAULT_SORT],
+            sort_keys=True,
+            ensure_ascii=False,
         )
-        return r['hits'] if r['hits'] else None
+
+    def search_articles(self, query: str, page: Union[str, int], start_date: float = None, end_date: float = None, filters: dict={}, cursor: str = None,
+                        deadline_from: float = None, deadline_to: float = None, sort: str = None) -> Tuple[Optional[List[dict]], Optional[str]]:
+        cache_key = self.search_cache_key(query, page, start_date, end_date, filters, cursor, deadline_from, deadline_to, sort)
+        result = self.search_cache.get(cache_key, _MISSING)
+        if result is not _MISSING:
+            return result
+        search_params = self.build_search_params(query, page, start_date, end_date, filters, cursor, deadline_from, deadline_to, sort)
+        opt_params = {key: value for key, value in search_params.items() if key != 'q'}
+        # construct Chinese tokens
+        with self.timer('search'):
+            r: dict = self.index.search(query = search_params['q'], opt_params = opt_params)
+        result = (r['hits'] if r['hits'] else None, self.build_next_cursor(search_params, r['hits'], cursor))
+        self.search_cache.set(cache_key, result)
+        return result
+
+    async def async_search_articles(self, query: str, page: Union[str, int], start_date: float = None, end_date: float = None, filters: dict={}, cursor: str = None,
+                        deadline_from: float = None, deadline_to: float = None, sort: str = None) -> Tuple[Optional[List[dict]], Optional[str]]:
+        cache_key = self.search_cache_key(query, page, start_date, end_date, filters, cursor, deadline_from, deadline_to, sort)
+        result = self.search_cache.get(cache_key, _MISSING)
+        if result is not _MISSING:
+            return result
+        search_params = self.build_search_params(query, page, start_date, end_date, filters, cursor, deadline_from, deadline_to, sort)
+        r: dict = await self.async_request('POST', f'/indexes/{self.index_uid}/search', operation='search', json=search_params)
+        result = (r['hits'] if r['hits'] else None, self.build_next_cursor(search_params, r['hits'], cursor))
+        self.search_cache.set(cache_key, result)
+        return result
+
+    async def async_multi_search_articles(self, searches: List[dict]) -> List[Tuple[Optional[List[dict]], Optional[str]]]:
+        """
+         Run several searches in a single Meilisearch multi-search request.
+
+         Args:
+         	 searches: Keyword arguments of async_search_articles, one dict per search
+
+         Returns:
+         	 (hits, next cursor) of every search, in the order of searches
+        """
+        results = [None] * len(searches)
+        pending = []
+        for i, search in enumerate(searches):
+            cache_key = self.search_cache_key(**search)
+            result = self.search_cache.get(cache_key, _MISSING)
+            if result is not _MISSING:
+                results[i] = result
+            else:
+                pending.append((i, cache_key, self.build_search_params(**search)))
+        if pending:
+            # 缓存未命中的搜索合并为一次请求
+            queries = [{'indexUid': self.index_uid, **search_params} for _, _, search_params in pending]
+            r: dict = await self.async_request('POST', '/multi-search', operation='multi_search', json={'queries': queries})
+            for (i, cache_key, search_params), response in zip(pending, r['results']):
+                result = (response['hits'] if response['hits'] else None, self.build_next_cursor(search_params, response['hits'], searches[i].get('cursor')))
+                self.search_cache.set(cache_key, result)
+                results[i] = result
+        return results
+
+    @staticmethod
+    def build_facet_params(start_date: float = None, end_date: float = None, filters: dict={}) -> dict:
+        # 只需要各维度的计数，不返回文章
+        return {
+            'q': '',
+            'limit': 0,
+            'filter': build_filter(start_date, end_date, filters),
+            'facets': FACET_FIELDS,
+        }
+
+    @staticmethod
+    def to_facet_counts(r: dict) -> Dict[str, Dict[str, int]]:
+        # 没有文章的维度不会出现在 facetDistribution 中
+        distribution = r.get('facetDistribution') or {}
+        return {field: distribution.get(field, {}) for field in FACET_FIELDS}
+
+    def refresh_facet_totals(self) -> Dict[str, Dict[str, int]]:
+        """
+         Recompute the unfiltered facet counts and keep them until the search generation changes.
+        """
+        generation = self.search_generation.current()
+        with self.timer('facets'):
+            r: dict = self.index.search('', self.build_facet_params())
+        self.facet_totals = (generation, self.to_facet_counts(r))
+        return self.facet_totals[1]
+
+    async def async_refresh_facet_totals(self) -> Dict[str, Dict[str, int]]:
+        """
+         Recompute the unfiltered facet counts if the search generation changed since they were computed.
+
+         Returns:
+         	 The unfiltered counts of the current generation
+        """
+        generation = self.search_generation.current()
+        if self.facet_totals is not None and self.facet_totals[0] == generation:
+            return self.facet_totals[1]
+        r: dict = await self.async_request('POST', f'/indexes/{self.index_uid}/search', operation='facets', json=self.build_facet_params())
+        self.facet_totals = (generation, self.to_facet_counts(r))
+        return self.facet_totals[1]
+
+    async def watch_facet_totals(self, interval: float):
+        """
+         Refresh the unfiltered facet counts every interval seconds once a crawl, reindex or backfill bumped
+         the search generation, so that requests do not have to recompute them.
+
+         Args:
+         	 interval: Seconds between two checks of the generation
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.async_refresh_facet_totals()
+            except Exception as e:
+                loggers.error_file_logger.error(f"刷新筛选计数失败: {e}")
+
+    async def async_get_facet_counts(self, start_date: float = None, end_date: float = None, filters: dict={}) -> Dict[str, Dict[str, int]]:
+        """
+         Count the articles per province, exam_type and info_type in a single facet query.
+
+         Args:
+         	 start_date: Lower bound of collect_date
+         	 end_date: Upper bound of collect_date
+         	 filters: Same filters as the search
+
+         Returns:
+         	 {field: {value: count}} for every field of FACET_FIELDS
+        """
+        if not (start_date or end_date or filters):
+            # 未筛选的计数由 watch_facet_totals 在代数变化后重新计算，这里只在其尚未完成时补算
+            return await self.async_refresh_facet_totals()
+
+        generation = self.search_generation.current()
+
+        normalized_filters = {key: sorted(value) if isinstance(value, list) else value for key, value in filters.items()}
+        cache_key = json.dumps(['facets', generation, start_date, end_date, normalized_filters], sort_keys=True, ensure_ascii=False)
+        result = self.search_cache.get(cache_key, _MISSING)
+        if result is not _MISSING:
+            return result
+        r: dict = await self.async_request('POST', f'/indexes/{self.index_uid}/search', operation='facets', json=self.build_facet_params(start_date, end_date, filters))
+        result = self.to_facet_counts(r)
+        self.search_cache.set(cache_key, result)
+        return result
+
+    async def async_get_article(self, id: str) -> dict:
+        doc: dict = await self.async_request('GET', f'/indexes/{self.index_uid}/documents/{id}', operation='get_document', params={'fields': ','.join(METADATA_FIELDS)})
+        html_content = get_content_store().get(id)
+        if html_content is None:
+            # 迁移到内容存储之前写入的文章，正文仍在索引中
+            legacy: dict = await self.async_request('GET', f'/indexes/{self.index_uid}/documents/{id}', operation='get_document', params={'fields': 'html_content'})
+            html_content = legacy.get('html_content')
+        doc['html_content'] = html_content
+        return doc
 
     def check_article_existence_by_title(self, article_title: str) -> bool:
         return self.index.get_documents({'filter': [f'title="{article_title}"']}).total == 0
     
+    def get_existing_titles(self, article_titles: List[str]) -> Set[str]:
+        existing_titles = set()
+        for chunk in chunked(article_titles, 100):
+            quoted_titles = ', '.join(quote_filter_value(t) for t in chunk)
+            r = self.index.get_documents({'filter': f'title IN [{quoted_titles}]', 'fields': ['title'], 'limit': 1000})
+            existing_titles.update(doc.title for doc in r.results)
+        return existing_titles
+
+    def iterate_titles(self, batch_size: int = 1000) -> Iterator[str]:
+        offset = 0
+        while True:
+            r = self.index.get_documents({'fields': ['title'], 'offset': offset, 'limit': batch_size})
+            for doc in r.results:
+                yield doc.title
+            offset += batch_size
+            if offset >= r.total:
+                break
+
+    def iterate_articles(self, batch_size: int = 1000) -> Iterator[Article]:
+        # 正文已经在内容存储中的文章，html_content 为 None
+        offset = 0
+        while True:
+            r: dict = self.client.http.get(f'indexes/{self.index_uid}/documents?offset={offset}&limit={batch_size}')
+            for doc in r['results']:
+                yield Article.model_validate(doc)
+            offset += batch_size
+            if offset >= r['total']:
+                break
+
     def insert_article(self, article: Article) -> None:
-        self.index.add_documents(documents=[{**article.model_dump()}])
\ No newline at end of file
+        # 先写入正文，文章出现在搜索结果中时即可读取详情
+        if article.html_content is not None:
+            get_content_store().put(article.id, article.html_content)
+        self.index.add_documents(documents=[to_document(article)])
+        self.search_generation.bump()
+
+    def insert_articles(self, articles: List[Article]) -> None:
+        # 一批文档只产生一个索引任务，并等待任务完成
+        get_content_store().put_many((article.id, article.html_content) for article in articles if article.html_content is not None)
+        task_info = self.index.add_documents(documents=[to_document(article) for article in articles])
+        task = self.index.wait_for_task(task_info.task_uid, timeout_in_ms=60000)
+        if task.status != 'succeeded':
+            raise ArticleInsertError(f"索引任务{task.uid}未成功: {task.status}, {task.error}")
+        self.search_generation.bump()
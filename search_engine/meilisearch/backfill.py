@@ -0,0 +1,94 @@
+"""
+Backfill the fields added after documents were indexed, as partial updates that leave the other fields
+and the HTML in the content store untouched:
+    apply_deadline_ts   computed from the stored apply_deadline text with timeutil.deadline_to_ts;
+                        documents whose deadline cannot be parsed keep no timestamp
+    seq                 insert sequence used by the search cursor; documents without it are listed after the ones of the same day
+
+Usage:
+    export PYTHONPATH=`pwd`
+    python -m search_engine.meilisearch.backfill --batch-size 1000
+    python -m search_engine.meilisearch.backfill --dry-run
+"""
+import argparse
+import os
+from typing import Iterator, List
+
+from search_engine.meilisearch.articles import next_seq
+from search_engine.meilisearch.manager import IndexManager
+from utilities import chunked, loggers, timeutil
+from utilities.cache import GenerationCounter
+
+class DocumentBackfill(IndexManager):
+
+    def __init__(self, index_uid: str = 'articles', batch_size: int = 1000, task_timeout_in_ms: int = 600000):
+        super().__init__(index_uid)
+        self.batch_size = batch_size
+        self.task_timeout_in_ms = task_timeout_in_ms
+
+    def iterate_missing(self) -> Iterator[dict]:
+        # 只读取需要的字段，不读取旧文档中可能还保存着的 html_content
+        offset = 0
+        while True:
+            r: dict = self.client.http.get(f'indexes/{self.index_uid}/documents?offset={offset}&limit={self.batch_size}&fields=id,apply_deadline,apply_deadline_ts,seq')
+            for doc in r['results']:
+                if doc.get('apply_deadline_ts') is None or doc.get('seq') is None:
+                    yield doc
+            offset += self.batch_size
+            if offset >= r['total']:
+                break
+
+    def run(self, dry_run: bool = False) -> dict:
+        """
+         Compute the missing apply_deadline_ts and seq of the documents and update them in batches.
+
+         Args:
+         	 dry_run: Only count the documents, nothing is written
+
+         Returns:
+         	 Counts of missing, updated and unparsed documents, and of assigned seq
+        """
+        stats = {'missing': 0, 'updated': 0, 'unparsed': 0, 'seq': 0}
+        # 先读取全部待更新的文档，分页读取时不会与写入交错
+        updates: List[dict] = []
+        for doc in self.iterate_missing():
+            stats['missing'] += 1
+            update = {}
+            if doc.get('apply_deadline_ts') is None:
+                ts = timeutil.deadline_to_ts(doc.get('apply_deadline'))
+                if ts is None:
+                    stats['unparsed'] += 1
+                else:
+                    update['apply_deadline_ts'] = ts
+            if doc.get('seq') is None:
+                update['seq'] = next_seq()
+                stats['seq'] += 1
+            if update:
+                updates.append({'id': doc['id'], **update})
+        if dry_run or not updates:
+            return stats
+
+        index = self.client.index(self.index_uid)
+        for batch in chunked(updates, self.batch_size):
+            task = self.client.wait_for_task(index.update_documents(batch, primary_key='id').task_uid, timeout_in_ms=self.task_timeout_in_ms)
+            if task.status != 'succeeded':
+                loggers.error_file_logger.error(f'回填任务{task.uid}未成功: {task.status}, {task.error}')
+                break
+            stats['updated'] += len(batch)
+            loggers.debug_file_logger.debug(f"已回填{stats['updated']}/{len(updates)}篇文章")
+        # 使服务端缓存的搜索结果失效
+        GenerationCounter(os.getenv('SEARCH_CACHE_GENERATION_PATH', './data/search_generation')).bump()
+        return stats
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--index', default='articles')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true', help='only count the documents to update')
+    args = parser.parse_args()
+
+    stats = DocumentBackfill(args.index, batch_size=args.batch_size).run(dry_run=args.dry_run)
+    print(f"{stats['missing']} documents to backfill, {stats['updated']} updated, {stats['seq']} assigned a seq, {stats['unparsed']} without a parsable deadline")
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,38 @@
 import os
 from meilisearch import Client
+from meilisearch.errors import MeilisearchApiError, MeilisearchTimeoutError
 from pydantic import BaseModel
 from typing import TypeVar
+from utilities import httpclient, loggers
+from utilities.metrics import MEILISEARCH_REQUEST_LATENCY
 
 # 使用 TypeVar 来定义泛型 T
 T = TypeVar('T', bound=BaseModel)
 
+# 与顺序无关的设置项，Meilisearch 返回时会重新排序
+UNORDERED_SETTINGS = {'filterableAttributes', 'sortableAttributes', 'stopWords', 'nonSeparatorTokens', 'separatorTokens'}
+
+def diff_settings(current: dict, desired: dict) -> dict:
+    """
+     Return the desired settings that differ from the current ones.
+
+     Args:
+     	 current: Settings returned by GET /indexes/{uid}/settings
+     	 desired: Settings to apply, with the same camelCase keys
+
+     Returns:
+     	 The subset of desired that has to be updated, empty when the index is up to date
+    """
+    changed = {}
+    for key, value in desired.items():
+        if key in UNORDERED_SETTINGS:
+            equal = set(current.get(key) or []) == set(value or [])
+        else:
+            equal = current.get(key) == value
+        if not equal:
+            changed[key] = value
+    return changed
+
 class IndexManager(object):
     def __init__(self,
         index_uid: str,
@@ -15,3 +42,53 @@ class IndexManager(object):
         self.index_uid = index_uid
         self.client = Client(client_url, master_key)
         self.index = self.client.index(uid=self.index_uid)
+        # 供FastAPI使用的异步客户端，避免同步请求阻塞事件循环
+        self.async_client = httpclient.AsyncClient(
+            base_url=client_url,
+            pool_maxsize=int(os.environ.get('MEILISEARCH_POOL_MAXSIZE', 100)),
+            headers={'Authorization': f'Bearer {master_key}'} if master_key else None,
+        )
+
+    def sync_settings(self, settings: dict, index_uid: str = None, timeout_in_ms: int = None) -> bool:
+        """
+         Update the index settings only when they differ from the desired ones, and wait for the settings task.
+         Changing settings such as filterable attributes reindexes every document, so an unchanged index is left alone.
+
+         Args:
+         	 settings: Desired settings, with camelCase keys
+         	 index_uid: Index to update, defaults to the index of this manager
+         	 timeout_in_ms: Maximum time to wait for the task, defaults to MEILISEARCH_SETTINGS_TIMEOUT_MS. The task keeps running after a timeout
+
+         Returns:
+         	 True if a settings update was enqueued
+        """
+        index = self.client.index(index_uid or self.index_uid)
+        try:
+            current = index.get_settings()
+        except MeilisearchApiError as e:
+            # 索引不存在时，更新设置会自动创建索引
+            if e.code != 'index_not_found':
+                raise
+            current = {}
+        changed = diff_settings(current, settings)
+        if not changed:
+            return False
+        loggers.debug_file_logger.debug(f"索引{index.uid}的设置需要更新: {sorted(changed)}")
+        task_info = index.update_settings(changed)
+        try:
+            task = self.client.wait_for_task(task_info.task_uid, timeout_in_ms or int(os.environ.get('MEILISEARCH_SETTINGS_TIMEOUT_MS', 60000)))
+            if task.status != 'succeeded':
+                loggers.error_file_logger.error(f"索引{index.uid}的设置任务{task.uid}未成功: {task.status}, {task.error}")
+        except MeilisearchTimeoutError:
+            loggers.error_file_logger.error(f"等待索引{index.uid}的设置任务{task_info.task_uid}超时, 任务将在后台继续执行")
+        return True
+
+    def timer(self, operation: str):
+        # 记录一次Meilisearch调用的耗时，operation 作为指标标签
+        return MEILISEARCH_REQUEST_LATENCY.labels(operation=operation).time()
+
+    async def async_request(self, method: str, path: str, operation: str = 'other', **kwargs) -> dict:
+        with self.timer(operation):
+            response = await self.async_client.request(method, path, **kwargs)
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,167 @@
+"""
+Rebuild the articles index from the Unicloud store, from a JSON Lines dump or from the live index itself, without downtime.
+The html_content of every article goes to the local content store, the index only receives the metadata.
+Rebuilding from the live index (--source meilisearch) moves the HTML of older documents out of the index.
+
+Documents are streamed into a new index in large batches (settings are applied first, so every document
+is indexed once), the indexing tasks are tracked until they succeed, and the new index is then swapped
+with the live one in a single atomic swap task. Searches keep hitting the old index until the swap.
+
+--source has no default: the unicloud source needs a cloud function listing the articles by skip/limit
+(UNI_APP_CLOUD_DB_LIST_ARTICLES_URL), which is not deployed yet.
+
+Usage:
+    export PYTHONPATH=`pwd`
+    python -m search_engine.meilisearch.reindex --source ./data/articles.jsonl --batch-size 5000
+    python -m search_engine.meilisearch.reindex --source meilisearch
+    python -m search_engine.meilisearch.reindex --source unicloud
+"""
+import argparse
+from collections import deque
+from datetime import datetime
+import os
+from typing import Iterable, Iterator
+from meilisearch.errors import MeilisearchApiError
+
+from db.mongodb.articles import UnicloudDBArticleManager
+from models.article import Article
+from search_engine.meilisearch.articles import ARTICLE_INDEX_SETTINGS, MeiliSearchArticleManager, to_document
+from search_engine.meilisearch.manager import IndexManager
+from utilities import chunked, loggers
+from utilities.cache import GenerationCounter
+from utilities.contentstore import get_content_store
+
+UNICLOUD_SOURCE = 'unicloud'
+MEILISEARCH_SOURCE = 'meilisearch'
+
+class ReindexError(Exception):
+    """重建索引失败，正在使用的索引保持不变"""
+    pass
+
+def iterate_dump(path: str) -> Iterator[Article]:
+    # 每行一个文章的JSON，逐行读取，不会把整个文件读入内存
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield Article.model_validate_json(line)
+
+def iterate_source(source: str, batch_size: int) -> Iterator[Article]:
+    if source == UNICLOUD_SOURCE:
+        return UnicloudDBArticleManager().iterate_articles(batch_size)
+    if source == MEILISEARCH_SOURCE:
+        return MeiliSearchArticleManager().iterate_articles(batch_size)
+    return iterate_dump(source)
+
+class Reindexer(IndexManager):
+
+    def __init__(self, index_uid: str = 'articles', batch_size: int = 5000, max_pending_tasks: int = 4, task_timeout_in_ms: int = 600000):
+        super().__init__(index_uid)
+        self.batch_size = batch_size
+        self.max_pending_tasks = max_pending_tasks
+        self.task_timeout_in_ms = task_timeout_in_ms
+
+    def _wait(self, task_uid: int):
+        task = self.client.wait_for_task(task_uid, timeout_in_ms=self.task_timeout_in_ms)
+        if task.status != 'succeeded':
+            raise ReindexError(f'任务{task.uid}({task.type})未成功: {task.status}, {task.error}')
+        return task
+
+    def _create_index(self, uid: str):
+        self._wait(self.client.create_index(uid, {'primaryKey': 'id'}).task_uid)
+
+    def index_exists(self, uid: str) -> bool:
+        try:
+            self.client.get_raw_index(uid)
+            return True
+        except MeilisearchApiError as e:
+            if e.code != 'index_not_found':
+                raise
+            return False
+
+    def load(self, target_uid: str, articles: Iterable[Article]) -> int:
+        """
+         Stream the articles into the target index in batches, keeping at most max_pending_tasks indexing tasks in flight.
+
+         Returns:
+         	 Number of documents sent
+        """
+        target = self.client.index(target_uid)
+        pending = deque()
+        total = 0
+        for batch in chunked(articles, self.batch_size):
+            # 正文写入内容存储，索引中只保存元数据
+            get_content_store().put_many((article.id, article.html_content) for article in batch if article.html_content is not None)
+            task_info = target.add_documents([to_document(article) for article in batch], primary_key='id')
+            pending.append(task_info.task_uid)
+            total += len(batch)
+            # 任务是按顺序执行的，等待最早的任务即可限制排队的数量
+            while len(pending) >= self.max_pending_tasks:
+                self._wait(pending.popleft())
+            loggers.debug_file_logger.debug(f"已向{target_uid}提交{total}篇文章")
+        while pending:
+            self._wait(pending.popleft())
+        return total
+
+    def reindex(self, articles: Iterable[Article], swap: bool = True, keep_old: bool = False, allow_empty: bool = False) -> str:
+        """
+         Build a new index from the articles and swap it with the live index.
+
+         Args:
+         	 articles: Articles to index
+         	 swap: Swap the new index with the live one, otherwise the new index is left next to it
+         	 keep_old: Keep the previous documents under the new index uid after the swap instead of deleting them
+         	 allow_empty: Allow swapping in an index without documents
+
+         Returns:
+         	 uid of the index that was built
+        """
+        new_uid = f"{self.index_uid}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        self._create_index(new_uid)
+        try:
+            # 先应用设置再写入文档，文档只会被索引一次
+            self.sync_settings(ARTICLE_INDEX_SETTINGS, index_uid=new_uid, timeout_in_ms=self.task_timeout_in_ms)
+            total = self.load(new_uid, articles)
+            stats = self.client.index(new_uid).get_stats()
+            loggers.debug_file_logger.debug(f"{new_uid}写入完成: 提交{total}篇, 索引中{stats.number_of_documents}篇")
+            if stats.number_of_documents == 0 and not allow_empty:
+                raise ReindexError(f'{new_uid}中没有文档, 不替换正在使用的索引')
+        except Exception:
+            self.client.delete_index(new_uid)
+            raise
+        if not swap:
+            return new_uid
+
+        if not self.index_exists(self.index_uid):
+            self._create_index(self.index_uid)
+        # 两个索引交换名称是一个原子任务，交换前的搜索仍然使用旧索引
+        self._wait(self.client.swap_indexes([{'indexes': [self.index_uid, new_uid]}]).task_uid)
+        # 使服务端缓存的搜索结果失效
+        GenerationCounter(os.getenv('SEARCH_CACHE_GENERATION_PATH', './data/search_generation')).bump()
+        if not keep_old:
+            # 交换后 new_uid 中是旧的文档
+            self._wait(self.client.delete_index(new_uid).task_uid)
+        loggers.debug_file_logger.debug(f"已用新建的索引替换{self.index_uid}")
+        return new_uid
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', required=True, help=f'"{UNICLOUD_SOURCE}" (requires UNI_APP_CLOUD_DB_LIST_ARTICLES_URL), "{MEILISEARCH_SOURCE}" or the path of a JSON Lines dump, one article per line')
+    parser.add_argument('--index', default='articles')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--max-pending-tasks', type=int, default=4)
+    parser.add_argument('--no-swap', action='store_true', help='build the new index without swapping it in')
+    parser.add_argument('--keep-old', action='store_true', help='keep the previous documents under the new index uid after the swap')
+    parser.add_argument('--allow-empty', action='store_true')
+    args = parser.parse_args()
+
+    reindexer = Reindexer(args.index, batch_size=args.batch_size, max_pending_tasks=args.max_pending_tasks)
+    uid = reindexer.reindex(
+        iterate_source(args.source, args.batch_size),
+        swap=not args.no_swap,
+        keep_old=args.keep_old,
+        allow_empty=args.allow_empty,
+    )
+    print(f'built {uid}' + ('' if args.no_swap else f' and swapped it with {args.index}'))
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,28 @@
+import asyncio
+import os
 from fastapi import FastAPI
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from server.middleware.metrics import metrics_middleware
 from server.routes.auth import router as auth_router
-from server.subapp.article import _subapp_article
+from server.subapp.article import _subapp_article, meilisearch_article_manager
+from utilities import metrics
 
 app = FastAPI()
+app.middleware('http')(metrics_middleware)
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.mount('/articles', _subapp_article)
+
+@app.on_event('startup')
+async def start_facet_refresh():
+    # 挂载的子应用不会收到 startup 事件，在主应用中启动；任务引用保存在 app.state 中以免被回收
+    interval = float(os.getenv('FACET_REFRESH_INTERVAL', 30))
+    app.state.facet_refresh_task = asyncio.create_task(meilisearch_article_manager.watch_facet_totals(interval))
+
+@app.on_event('shutdown')
+async def stop_facet_refresh():
+    app.state.facet_refresh_task.cancel()
+
+@app.get('/metrics', include_in_schema=False)
+async def get_metrics():
+    content, content_type = metrics.render_latest()
+    return Response(content=content, media_type=content_type)
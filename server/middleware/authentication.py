@@ -1,6 +1,22 @@
+import os
+import time
 from fastapi import HTTPException, Request, Response
-from server.routes.auth import get_current_client
+from server.routes.auth import verify_token
+from utilities.cache import TTLCache
 
+# 已验证的token缓存，在token的exp时刻过期
+verified_tokens = TTLCache(maxsize=int(os.getenv('TOKEN_CACHE_MAXSIZE', 4096)))
+
+def authenticate(token: str) -> str:
+    client_id = verified_tokens.get(token)
+    if client_id is None:
+        payload = verify_token(token)
+        client_id = payload["sub"]
+        # exp 为UTC时间戳，没有exp的token不缓存
+        ttl = payload.get("exp", 0) - time.time()
+        if ttl > 0:
+            verified_tokens.set(token, client_id, ttl=ttl)
+    return client_id
 
 async def auth_middleware(request: Request, call_next):
     try:
@@ -11,11 +27,11 @@ async def auth_middleware(request: Request, call_next):
         if token.startswith("Bearer "):
             token = token[7:]  # 或者使用 split() 方法分割字符串
         # 调用认证逻辑
-        client_id = await get_current_client(token)
+        client_id = authenticate(token)
     except HTTPException as e:
         # 如果认证失败，则返回错误响应
         return Response(content=e.detail, status_code=e.status_code)
 
     # 如果认证成功，继续处理请求
     response = await call_next(request)
-    return response
\ No newline at end of file
+    return response
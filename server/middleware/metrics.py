@@ -0,0 +1,25 @@
+import time
+from fastapi import Request
+from utilities.metrics import HTTP_REQUEST_LATENCY
+
+def route_label(request: Request) -> str:
+    # 使用路由模板而不是实际路径，避免 /articles/{id} 等路径产生过多的标签值
+    route = request.scope.get('route')
+    if route is None:
+        return 'unmatched'
+    # 挂载的子应用会把挂载路径记录在 root_path 中
+    return request.scope.get('root_path', '') + route.path
+
+async def metrics_middleware(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        HTTP_REQUEST_LATENCY.labels(
+            method=request.method,
+            route=route_label(request),
+            status_code=status_code,
+        ).observe(time.perf_counter() - start)
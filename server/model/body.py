@@ -5,5 +5,17 @@ class SearchArticles(BaseModel):
     query: str
     start_date: str = None
     end_date: str = None
-    page: Union[int, str]
-    filters: dict
\ No newline at end of file
+    page: Union[int, str] = 1
+    # 上一页返回的cursor，指定时忽略page
+    cursor: str = None
+    filters: dict
+    # 报名截止日期范围（YYYY-MM-DD），两端都包含
+    deadline_from: str = None
+    deadline_to: str = None
+    # 排序方式，如 apply_deadline_ts:asc，默认按收录时间倒序
+    sort: str = None
+
+class FacetArticles(BaseModel):
+    start_date: str = None
+    end_date: str = None
+    filters: dict = {}
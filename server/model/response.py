@@ -1,4 +1,4 @@
-from typing import TypeVar
+from typing import Optional, TypeVar
 from pydantic import BaseModel
 
 T = TypeVar('T')
@@ -7,3 +7,5 @@ class Response(BaseModel):
     code: int
     msg: str
     result: T
+    # 分页查询时用于获取下一页
+    cursor: Optional[str] = None
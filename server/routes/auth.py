@@ -39,7 +39,7 @@ async def token(form_data: OAuth2PasswordRequestForm = Depends()):
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-async def get_current_client(token: str = Depends(oauth2_scheme)):
+def verify_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, constant.SECRET_KEY, algorithms=[constant.ALGORITHM])
         client_id: str = payload.get("sub")
@@ -49,4 +49,7 @@ async def get_current_client(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=401, detail="Token expired")
     except JWTError:
         raise credentials_exception
-    return client_id
+    return payload
+
+async def get_current_client(token: str = Depends(oauth2_scheme)):
+    return verify_token(token)["sub"]
@@ -1,28 +1,108 @@
-from fastapi import FastAPI
+import os
+from typing import List
+from fastapi import FastAPI, HTTPException, Request
+from starlette.responses import Response as RawResponse
 
-from search_engine.meilisearch.articles import MeiliSearchArticleManager
+from search_engine.meilisearch.articles import SORT_OPTIONS, MeiliSearchArticleManager
 from server.middleware.authentication import auth_middleware
-from server.model.body import SearchArticles
+from server.model.body import FacetArticles, SearchArticles
 from server.model.response import Response
-from utilities import timeutil
+from utilities import httpcache, timeutil
+from utilities.cache import TTLCache
 
 _subapp_article = FastAPI()
 _subapp_article.middleware('http')(auth_middleware)
 meilisearch_article_manager = MeiliSearchArticleManager()
+# 文章详情的响应体缓存，文章写入后基本不会再变化
+article_detail_cache = TTLCache(
+    maxsize=int(os.getenv('DETAIL_CACHE_MAXSIZE', 512)),
+    ttl=float(os.getenv('DETAIL_CACHE_TTL', 3600)),
+    # 每个条目包含原文与 gzip、br 三份响应体，按总字节数限制内存占用
+    maxbytes=int(os.getenv('DETAIL_CACHE_MAXBYTES', 64 * 1024 * 1024)),
+    sizeof=httpcache.PrecompressedBody.size,
+)
+# 一次批量搜索最多包含的搜索数
+MULTI_SEARCH_MAX_QUERIES = int(os.getenv('MULTI_SEARCH_MAX_QUERIES', 10))
 
-@_subapp_article.post("/all")
-async def search_articles(params: SearchArticles):
-    search_results = meilisearch_article_manager.search_articles(
+def to_search_kwargs(params: SearchArticles) -> dict:
+    # 校验并转换请求参数，/all 与 /multi 共用
+    if params.sort and params.sort not in SORT_OPTIONS:
+        raise HTTPException(status_code=400, detail=f'Invalid sort, expected one of {sorted(SORT_OPTIONS)}')
+    try:
+        start_date = timeutil.local_dt_str_to_utc_ts(params.start_date) if params.start_date else None
+        end_date = timeutil.local_dt_str_to_utc_ts(params.end_date) if params.end_date else None
+        deadline_from = timeutil.local_dt_str_to_utc_ts(params.deadline_from) if params.deadline_from else None
+        # 截止日期当天的 23:59:59 也在范围内
+        deadline_to = timeutil.local_dt_str_to_utc_ts(params.deadline_to) + 86399 if params.deadline_to else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail='Invalid date range')
+    return dict(
         query = params.query,
         page = params.page,
-        start_date = timeutil.local_dt_str_to_utc_ts(params.start_date) if params.start_date else None,
-        end_date = timeutil.local_dt_str_to_utc_ts(params.end_date) if params.end_date else None,
+        start_date = start_date,
+        end_date = end_date,
         filters = params.filters,
+        cursor = params.cursor,
+        deadline_from = deadline_from,
+        deadline_to = deadline_to,
+        sort = params.sort,
     )
-    return Response(code=1, msg='Success', result=search_results)
+
+@_subapp_article.post("/all")
+async def search_articles(params: SearchArticles):
+    search_kwargs = to_search_kwargs(params)
+    try:
+        search_results, next_cursor = await meilisearch_article_manager.async_search_articles(**search_kwargs)
+    except (ValueError, KeyError):
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    return Response(code=1, msg='Success', result=search_results, cursor=next_cursor)
+
+@_subapp_article.post("/multi")
+async def multi_search_articles(params: List[SearchArticles]):
+    if not params or len(params) > MULTI_SEARCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f'Expected 1 to {MULTI_SEARCH_MAX_QUERIES} searches')
+    searches = [to_search_kwargs(p) for p in params]
+    try:
+        results = await meilisearch_article_manager.async_multi_search_articles(searches)
+    except (ValueError, KeyError):
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    # 与请求中的搜索顺序一致，每项包含该搜索的结果与下一页的cursor
+    return Response(code=1, msg='Success', result=[{'result': search_results, 'cursor': next_cursor} for search_results, next_cursor in results])
+
+@_subapp_article.post("/facets")
+async def facet_counts(params: FacetArticles):
+    try:
+        start_date = timeutil.local_dt_str_to_utc_ts(params.start_date) if params.start_date else None
+        end_date = timeutil.local_dt_str_to_utc_ts(params.end_date) if params.end_date else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail='Invalid date range')
+    counts = await meilisearch_article_manager.async_get_facet_counts(start_date, end_date, params.filters)
+    return Response(code=1, msg='Success', result=counts)
+
+@_subapp_article.get("/cache/stats")
+async def search_cache_stats():
+    return Response(code=1, msg='Success', result={
+        'search': meilisearch_article_manager.search_cache.stats(),
+        'detail': article_detail_cache.stats(),
+    })
 
 @_subapp_article.get("/{id}")
-async def search_article(id: str):
-    doc = dict(meilisearch_article_manager.index.get_document(id))
-    doc.pop('_Document__doc')
-    return Response(code=1, msg='Success', result=doc)
\ No newline at end of file
+async def search_article(id: str, request: Request):
+    body: httpcache.PrecompressedBody = article_detail_cache.get(id)
+    if body is None:
+        doc = await meilisearch_article_manager.async_get_article(id)
+        body = httpcache.PrecompressedBody(Response(code=1, msg='Success', result=doc).model_dump_json().encode('utf-8'))
+        article_detail_cache.set(id, body)
+
+    encoding = httpcache.negotiate_encoding(request.headers.get('Accept-Encoding'), body.encodings)
+    headers = {
+        'ETag': body.etag,
+        'Vary': 'Accept-Encoding',
+        # 客户端可以缓存，但每次使用前需要用 If-None-Match 重新验证
+        'Cache-Control': 'private, no-cache',
+    }
+    if httpcache.etag_matches(request.headers.get('If-None-Match'), body.etag):
+        return RawResponse(status_code=304, headers=headers)
+    if encoding != httpcache.IDENTITY:
+        headers['Content-Encoding'] = encoding
+    return RawResponse(content=body.encodings[encoding], media_type=body.media_type, headers=headers)
\ No newline at end of file
@@ -12,4 +12,15 @@ def Singleton(cls):
                     _instance[cls] = cls(*args, **kargs)
         return _instance[cls]
 
-    return _singleton
\ No newline at end of file
+    return _singleton
+
+def chunked(items, size: int):
+    # 将可迭代对象按固定大小切分成多个list
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,138 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+class PersistentLRUCache(object):
+    """
+     Key-value cache persisted in a SQLite table, with the most recently used entries kept in memory.
+
+     Values must be JSON serializable. Entries are never evicted from disk, only from memory.
+    """
+
+    def __init__(self, path: str, table: str = 'cache', maxsize: int = 10000):
+        self.table = table
+        self.maxsize = maxsize
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 爬虫的多个worker线程共用一个连接，由锁保证串行访问
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+    def _remember(self, key: str, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            row = self._conn.execute(f'SELECT value FROM {self.table} WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return default
+            value = json.loads(row[0])
+            self._remember(key, value)
+            return value
+
+    def set(self, key: str, value) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute(f'INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)', (key, json.dumps(value, ensure_ascii=False)))
+            self._remember(key, value)
+
+class TTLCache(object):
+    """
+     In-memory cache bounded by size (least recently used entries are evicted first) whose entries expire after ttl seconds.
+     With maxbytes and sizeof, the total size of the values is bounded too, and a value larger than maxbytes is not cached.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60, maxbytes: int = None, sizeof: Callable[[Any], int] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof or (lambda _: 0)
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        # key -> (过期时间, 值, 大小)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, key) -> None:
+        self._bytes -= self._data.pop(key)[2]
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._evict(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: float = None) -> None:
+        # ttl 为空时使用缓存默认的过期时间
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._evict(key)
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, size)
+            self._bytes += size
+            while len(self._data) > self.maxsize or (self.maxbytes is not None and self._bytes > self.maxbytes):
+                self._evict(next(iter(self._data)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize, 'ttl': self.ttl, 'bytes': self._bytes, 'maxbytes': self.maxbytes}
+
+class GenerationCounter(object):
+    """
+     Counter stored in a file so that separate processes (e.g. the crawler and the API server) can share it.
+     Writers bump it after changing the data, readers include it in their cache keys.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._value = 0
+
+    def current(self) -> int:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+        # 文件未修改时直接使用上次读取的值
+        if mtime != self._mtime:
+            with open(self.path, encoding='utf-8') as f:
+                self._value = int(f.read().strip() or 0)
+            self._mtime = mtime
+        return self._value
+
+    def bump(self) -> int:
+        with self._lock:
+            value = self.current() + 1
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(str(value))
+            os.replace(tmp_path, self.path)
+            return value
@@ -6,6 +6,9 @@ TEST_ENV = 'test'
 HYPHEN_JOINED_DATE_FORMAT = '%Y-%m-%d'
 HYPHEN_JOINED_DATE_REGEX = r'\d{4}-\d{2}-\d{2}'
 DEFAULT_TZ='Asia/Shanghai'
+HTTP_FETCH_MODE = 'http'
+SINGLE_TAB_NAVIGATION = 'tab'
+HTTP_TIMEOUT = 10
 
 
 load_dotenv()
@@ -17,4 +20,5 @@ CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
-CHROME_BROWSER_PATH_FOR_SELENIUM = os.getenv("CHROME_BROWSER_PATH_FOR_SELENIUM")
\ No newline at end of file
+CHROME_BROWSER_PATH_FOR_SELENIUM = os.getenv("CHROME_BROWSER_PATH_FOR_SELENIUM")
+USER_AGENT = os.getenv("USER_AGENT", 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36')
\ No newline at end of file
@@ -0,0 +1,138 @@
+import mmap
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class ContentStore(object):
+    """
+     Append-only store of compressed article HTML, kept outside of the search index.
+
+     Contents are zlib-compressed and appended to segment files (segment-00000.dat, ...) that roll over at segment_size bytes.
+     A SQLite table maps each id to (segment, offset, length), and segments are read through read-only memory maps.
+     The data is appended and flushed before the index row is committed, so readers in other processes (the API server)
+     never see a partial record. Rewriting an id appends a new record, the old bytes are left in place.
+    """
+
+    def __init__(self, directory: str, segment_size: int = 256 * 1024 * 1024, compress_level: int = 6):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._maps: Dict[int, mmap.mmap] = {}
+        os.makedirs(directory, exist_ok=True)
+        # 爬虫的多个worker线程共用一个连接，由锁保证串行访问
+        self._conn = sqlite3.connect(os.path.join(directory, 'index.sqlite3'), check_same_thread=False)
+        with self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS contents (id TEXT PRIMARY KEY, segment INTEGER NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL)')
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f'segment-{segment:05d}.dat')
+
+    def _last_segment(self) -> int:
+        row = self._conn.execute('SELECT MAX(segment) FROM contents').fetchone()
+        return row[0] or 0
+
+    def _append(self, records: Iterable[Tuple[str, bytes]]) -> list:
+        rows = []
+        segment = self._last_segment()
+        f = open(self._segment_path(segment), 'ab')
+        try:
+            # 多个进程同时写入时（如爬虫与重建索引工具），文件锁保证追加的偏移量正确
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            for key, data in records:
+                offset = f.seek(0, os.SEEK_END)
+                if offset and offset + len(data) > self.segment_size:
+                    f.flush()
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+                    f.close()
+                    segment += 1
+                    f = open(self._segment_path(segment), 'ab')
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_EX)
+                    offset = f.seek(0, os.SEEK_END)
+                f.write(data)
+                rows.append((key, segment, offset, len(data)))
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+        return rows
+
+    def put_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        records = [(key, zlib.compress(content.encode('utf-8'), self.compress_level)) for key, content in items]
+        if not records:
+            return
+        with self._lock:
+            rows = self._append(records)
+            with self._conn:
+                self._conn.executemany('INSERT OR REPLACE INTO contents (id, segment, offset, length) VALUES (?, ?, ?, ?)', rows)
+
+    def put(self, key: str, content: str) -> None:
+        self.put_many([(key, content)])
+
+    def _map(self, segment: int, end: int) -> mmap.mmap:
+        mapped = self._maps.get(segment)
+        # 段文件在映射之后还会继续增长，记录超出映射范围时重新映射
+        if mapped is None or len(mapped) < end:
+            if mapped is not None:
+                mapped.close()
+            with open(self._segment_path(segment), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = mapped
+        return mapped
+
+    def get_compressed(self, key: str) -> Optional[bytes]:
+        """
+         Return the zlib-compressed content of the id, or None when the id is not stored.
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT segment, offset, length FROM contents WHERE id = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            segment, offset, length = row
+            return self._map(segment, offset + length)[offset:offset + length]
+
+    def get(self, key: str) -> Optional[str]:
+        data = self.get_compressed(key)
+        return zlib.decompress(data).decode('utf-8') if data is not None else None
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM contents WHERE id = ?', (key,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM contents').fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+            self._conn.close()
+
+_content_store = None
+_content_store_lock = threading.Lock()
+
+def get_content_store() -> ContentStore:
+    # 进程内共用一个内容存储，目录由 CONTENT_STORE_DIR 指定
+    global _content_store
+    if _content_store is None:
+        with _content_store_lock:
+            if _content_store is None:
+                _content_store = ContentStore(
+                    os.getenv('CONTENT_STORE_DIR', './data/content'),
+                    segment_size=int(os.getenv('CONTENT_STORE_SEGMENT_SIZE', 256 * 1024 * 1024)),
+                )
+    return _content_store
@@ -1,9 +1,9 @@
+from contextlib import contextmanager
 from functools import wraps
 import os
 from typing import Callable, List
 from selenium import webdriver
-from selenium.webdriver.remote.webelement import WebElement
-from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
 
 from utilities.constant import TEST_ENV
 
@@ -21,76 +21,88 @@ def switch_to_lastest_window(driver: webdriver.Chrome):
     driver.switch_to.window(latest_window)
     return latest_window
 
-def iterate_over_web_elements(
-    driver: webdriver.Chrome,
-    selector_value: str,
-    selector: str = By.CSS_SELECTOR,
-    filter: Callable[[WebElement], bool] = lambda _: True,
-    stop: Callable[[WebElement], bool] = lambda _: False
-):
+@contextmanager
+def no_implicit_wait(driver: webdriver.Chrome):
+    """
+     Context manager that disables the implicit wait of the driver, so that looking up an element that may be absent fails immediately.
     """
-     Decorator to iterate over web elements. The function will be called with a list of WebElements that match the selector_value
+    implicit_wait = driver.timeouts.implicit_wait
+    driver.implicitly_wait(0)
+    try:
+        yield driver
+    finally:
+        driver.implicitly_wait(implicit_wait)
+
+def wait_until_page_ready(driver: webdriver.Chrome, timeout: float = 10):
+    """
+     Wait until the document is loaded and no jQuery ajax request is in flight.
      
+     Args:
+     	 driver: WebDriver instance to wait on
+     	 timeout: Maximum number of seconds to wait
+    """
+    WebDriverWait(driver, timeout).until(lambda d: d.execute_script(
+        "return document.readyState === 'complete' && (!window.jQuery || window.jQuery.active === 0);"
+    ))
+
+# 一次性读取所有匹配元素的文本、链接、标题与<time>文本
+SNAPSHOT_SCRIPT = """
+return Array.from(document.querySelectorAll(arguments[0])).map(function (e, i) {
+    var a = e.tagName === 'A' ? e : e.querySelector('a');
+    var time = e.querySelector('time');
+    return {
+        index: i,
+        text: e.innerText.trim(),
+        href: a ? a.href : null,
+        title: a ? (a.getAttribute('title') || a.innerText).trim() : null,
+        time: time ? time.innerText.trim() : null
+    };
+});
+"""
+
+def snapshot_elements(driver: webdriver.Chrome, selector_value: str) -> List[dict]:
+    """
+     Read the text, link, title and <time> text of every element matching the CSS selector in a single WebDriver round-trip.
+
      Args:
      	 driver: WebDriver instance to be used for finding the elements
-     	 selector_value: Value of the selector to be used for finding the elements
-     	 selector: CSS Selector to be used for finding the elements
-     
+     	 selector_value: CSS selector of the elements
+
      Returns: 
-     	 None
+     	 One dict per element with the keys index, text, href, title and time
     """
-    def outer_wrapper(func):
-        @wraps(func)
-        def inner_wrapper(*args, **kwargs):
-            """
-             Inner function to find elements and pass them to the function that is called in sequence.
-            """
-            num_of_elements = len(driver.find_elements(selector, selector_value))
-            if os.environ.get('RUNNING_ENV') == TEST_ENV:
-                num_of_elements = min(num_of_elements, 2)
-            # Find elements in the driver and call func.
-            for i in range(num_of_elements):
-                elements: List[WebElement] = driver.find_elements(selector, selector_value)
-                element = elements[i]
-                if stop(element):
-                    break
-                elif filter(element):
-                    kwargs['web_element'] = elements[i]
-                    func(*args, **kwargs)
-        return inner_wrapper
-    return outer_wrapper
-
+    return driver.execute_script(SNAPSHOT_SCRIPT, selector_value)
 
-def operate_in_new_window(
+def iterate_over_snapshot(
     driver: webdriver.Chrome,
-    initial_page: str,
+    selector_value: str,
+    filter: Callable[[dict], bool] = lambda _: True,
+    stop: Callable[[dict], bool] = lambda _: False
 ):
     """
-     Decorator for clicking an element and open a new window. It is used to execute function in new window
+     Decorator to iterate over a snapshot of the elements matching selector_value. filter and stop run in Python on the
+     snapshot, and the function is only called, with the keyword argument item, for the items that pass them.
      
      Args:
-     	 driver: WebDriver object to work with
-     	 initial_page: Page to switch to after clicking
+     	 driver: WebDriver instance to be used for taking the snapshot
+     	 selector_value: CSS selector of the elements
+     	 filter: Items for which it returns False are skipped
+     	 stop: The iteration ends at the first item for which it returns True
      
      Returns: 
      	 None
     """
     def outer_wrapper(func):
         @wraps(func)
-        def inner_wrapper(*args, web_element, **kwargs):
-            """
-             Inner function for clicking an element and open a new window. It is used to execute function in new window
-            """
-            web_element.click()
-            
-
-            switch_to_lastest_window(driver)
-            # Execute operation in new window 
-            func(*args, **kwargs)
-            
-            # close the current window and switch back to the initial page
-            driver.close()
-            driver.switch_to.window(initial_page)
-
+        def inner_wrapper(*args, **kwargs):
+            items = snapshot_elements(driver, selector_value)
+            if os.environ.get('RUNNING_ENV') == TEST_ENV:
+                items = items[:2]
+            for item in items:
+                if stop(item):
+                    break
+                elif filter(item):
+                    kwargs['item'] = item
+                    func(*args, **kwargs)
         return inner_wrapper
     return outer_wrapper
@@ -0,0 +1,77 @@
+import gzip
+import hashlib
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IDENTITY = 'identity'
+GZIP = 'gzip'
+BROTLI = 'br'
+
+# 较小的响应体压缩后收益很小
+MIN_COMPRESS_SIZE = 512
+
+class PrecompressedBody(object):
+    """
+     Serialized response body kept together with its compressed encodings and a strong ETag derived from its content.
+    """
+
+    def __init__(self, body: bytes, media_type: str = 'application/json'):
+        self.media_type = media_type
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.encodings: Dict[str, bytes] = {IDENTITY: body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            # mtime=0 使相同内容的压缩结果保持一致
+            self.encodings[GZIP] = gzip.compress(body, compresslevel=6, mtime=0)
+            if brotli:
+                self.encodings[BROTLI] = brotli.compress(body, quality=5)
+
+    def size(self) -> int:
+        return sum(len(data) for data in self.encodings.values())
+
+def parse_accept_encoding(accept_encoding: Optional[str]) -> Dict[str, float]:
+    # 解析 Accept-Encoding 中的编码及其q值
+    encodings = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        encodings[name.strip().lower()] = q
+    return encodings
+
+def negotiate_encoding(accept_encoding: Optional[str], available) -> str:
+    """
+     Choose the content encoding for the request among the available ones, preferring br over gzip at equal q-values.
+
+     Args:
+     	 accept_encoding: Value of the Accept-Encoding header
+     	 available: Encodings the body is available in
+
+     Returns:
+     	 br, gzip or identity
+    """
+    accepted = parse_accept_encoding(accept_encoding)
+    best, best_q = IDENTITY, 0.0
+    for encoding in (BROTLI, GZIP):
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if encoding in available and q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match 使用弱比较，忽略 W/ 前缀
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
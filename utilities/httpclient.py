@@ -0,0 +1,121 @@
+import asyncio
+import os
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utilities import constant
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class TimeoutSession(requests.Session):
+    """
+     requests.Session that applies a default timeout to every request that does not set one.
+    """
+
+    def __init__(self, timeout: float = constant.HTTP_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+def create_session(
+    pool_maxsize: int = 10,
+    headers: dict = None,
+    timeout: float = constant.HTTP_TIMEOUT,
+    retries: int = 3,
+    backoff_factor: float = 0.5,
+) -> requests.Session:
+    """
+     Create a requests session whose connections are pooled and kept alive across calls.
+
+     Args:
+     	 pool_maxsize: Maximum number of connections kept per host
+     	 headers: Default headers sent with every request
+     	 timeout: Default timeout in seconds of every request
+     	 retries: Maximum number of retries on connection errors and retryable status codes
+     	 backoff_factor: Factor of the exponential backoff between retries
+
+     Returns: 
+     	 The configured session
+    """
+    session = TimeoutSession(timeout)
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        # 只有幂等请求会因状态码重试，POST仅在连接失败时重试
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+     Return the process wide session shared by all outbound service calls, configured from environment variables.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session(
+                    pool_maxsize=int(os.getenv('HTTP_POOL_MAXSIZE', 10)),
+                    timeout=float(os.getenv('HTTP_TIMEOUT', constant.HTTP_TIMEOUT)),
+                    retries=int(os.getenv('HTTP_RETRIES', 3)),
+                    backoff_factor=float(os.getenv('HTTP_BACKOFF_FACTOR', 0.5)),
+                )
+    return _session
+
+class AsyncClient(object):
+    """
+     Async counterpart of the pooled session, wrapping httpx.AsyncClient with bounded retries and backoff.
+    """
+
+    def __init__(self,
+        base_url: str = '',
+        pool_maxsize: int = 10,
+        headers: dict = None,
+        timeout: float = constant.HTTP_TIMEOUT,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+    ):
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            # 传入 transport 时 httpx 会忽略 client 的 limits，连接池大小需设置在 transport 上；连接失败时由transport重试
+            transport=httpx.AsyncHTTPTransport(
+                retries=retries,
+                limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+            ),
+        )
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        for attempt in range(self.retries + 1):
+            response = await self.client.request(method, url, **kwargs)
+            if response.status_code not in RETRY_STATUS_CODES or method.upper() == 'POST' or attempt == self.retries:
+                return response
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('POST', url, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,22 @@
+from prometheus_client import CONTENT_TYPE_LATEST, Histogram, generate_latest
+
+# 默认分桶上限为10s，搜索接口的耗时主要分布在毫秒级，补充更细的分桶
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Latency of HTTP requests by route',
+    ['method', 'route', 'status_code'],
+    buckets=LATENCY_BUCKETS,
+)
+
+MEILISEARCH_REQUEST_LATENCY = Histogram(
+    'meilisearch_request_duration_seconds',
+    'Latency of Meilisearch calls by operation',
+    ['operation'],
+    buckets=LATENCY_BUCKETS,
+)
+
+def render_latest() -> (bytes, str):
+    # 返回Prometheus文本格式的指标及其Content-Type
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,106 @@
+import json
+import os
+import re
+from typing import Dict, Iterable, Union
+from bs4 import BeautifulSoup, Tag
+
+try:
+    import lxml  # noqa: F401
+    FAST_HTML_PARSER = 'lxml'
+except ImportError:
+    FAST_HTML_PARSER = 'html.parser'
+
+def parse_fragment(content: str) -> Tag:
+    """
+     Parse an HTML fragment with the fastest available parser and return the element holding it.
+    """
+    if FAST_HTML_PARSER == 'lxml':
+        # lxml 会给片段补全 <html><body><p> 等外层标签，用一个div包裹片段以保持片段原样
+        return BeautifulSoup(f'<div>{content}</div>', FAST_HTML_PARSER).body.div
+    return BeautifulSoup(content, FAST_HTML_PARSER)
+
+def default_rules() -> dict:
+    return {
+        # 文本中包含这些内容的标签整体删除
+        'remove_texts': ['公考雷达'],
+        # href 中包含这些内容的链接删除
+        'remove_link_hrefs': ['www.gongkaoleida.com/search'],
+        # 删除后剩余的文本替换
+        'replacements': {'公考雷达': os.getenv('APP_NAME', '公考营地')},
+    }
+
+def load_rules(path: str = None) -> dict:
+    """
+     Load sanitizer rules from a JSON file, keys that are absent fall back to the default rules.
+
+     Args:
+     	 path: Path of the JSON rules file, defaults to the SANITIZER_RULES_PATH environment variable
+
+     Returns:
+     	 A dict with remove_texts, remove_link_hrefs and replacements
+    """
+    rules = default_rules()
+    path = path or os.getenv('SANITIZER_RULES_PATH')
+    if path:
+        with open(path, encoding='utf-8') as f:
+            rules.update(json.load(f))
+    return rules
+
+class HtmlSanitizer(object):
+    """
+     Removes the tags that mention the source site and replaces sensitive words in article HTML.
+
+     Rules are compiled once: the texts of the removal rules and the keys of the replacement rules
+     each become one alternation regex, so every text or document is scanned once whatever the number of rules.
+    """
+
+    def __init__(self, remove_texts: Iterable[str] = (), remove_link_hrefs: Iterable[str] = (), replacements: Dict[str, str] = None):
+        self.remove_link_hrefs = tuple(remove_link_hrefs)
+        self.replacements = dict(replacements or {})
+        self._remove_pattern = self._compile(remove_texts)
+        self._replace_pattern = self._compile(self.replacements.keys())
+
+    @classmethod
+    def from_config(cls, path: str = None) -> 'HtmlSanitizer':
+        return cls(**load_rules(path))
+
+    @staticmethod
+    def _compile(words: Iterable[str]):
+        # 较长的词优先匹配，避免被其前缀截断
+        words = sorted(set(w for w in words if w), key=len, reverse=True)
+        return re.compile('|'.join(re.escape(w) for w in words)) if words else None
+
+    def replace(self, text: str) -> str:
+        if self._replace_pattern is None:
+            return text
+        return self._replace_pattern.sub(lambda m: self.replacements[m.group(0)], text)
+
+    def _remove_tags_with_text(self, root: Tag):
+        # 子标签的文本是父标签文本的一部分，不匹配的标签内部也不会有匹配的标签，
+        # 所以只需检查根节点的直接子标签，匹配的标签连同其内部一起删除
+        for child in list(root.children):
+            if isinstance(child, Tag) and self._remove_pattern.search(child.get_text()):
+                child.extract()
+
+    def _remove_links(self, node: Tag):
+        for link in node.find_all('a', href=True):
+            if any(href in link['href'] for href in self.remove_link_hrefs):
+                link.extract()
+
+    def sanitize(self, content: Union[str, Tag]) -> str:
+        """
+         Sanitize article HTML.
+
+         Args:
+         	 content: HTML fragment, or an already parsed element whose children are the article (it is modified in place)
+
+         Returns:
+         	 The sanitized HTML of the fragment, or of the children of the element
+        """
+        root = parse_fragment(content) if isinstance(content, str) else content
+        if self._remove_pattern is not None and self._remove_pattern.search(root.get_text()):
+            self._remove_tags_with_text(root)
+        if self.remove_link_hrefs:
+            self._remove_links(root)
+        html = root.decode() if isinstance(root, BeautifulSoup) else root.decode_contents()
+        return self.replace(html)
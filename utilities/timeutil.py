@@ -2,8 +2,12 @@ import os
 import re
 import requests
 import pytz
+import threading
+from contextlib import nullcontext
 from datetime import datetime
-from utilities import constant, loggers
+from typing import Callable, ContextManager, Optional
+from utilities import constant, httpclient, loggers
+from utilities.cache import PersistentLRUCache
 
 def get_tz():
     return pytz.timezone(os.getenv('TZ', constant.DEFAULT_TZ))
@@ -23,6 +27,47 @@ def format_date(date_str: str) -> str:
     formatted_date = re.sub(r'日', ' ' if len(date_str) > 10 else '', formatted_date)
     return formatted_date
 
+# 年月日之间的分隔符可能是 - / . 或 年 月，时间部分可选；之后的日期可能省略年份，如 2023年10月29日至11月7日
+DEADLINE_PATTERN = re.compile(r'(?:(\d{4})\D{1,2}(\d{1,2})\D{1,2}(\d{1,2})|(\d{1,2})月(\d{1,2}))(?:\D{1,3}?(\d{1,2})[:：](\d{1,2}))?')
+
+def deadline_to_ts(deadline: Optional[str]) -> Optional[float]:
+    """
+     Convert the apply deadline returned by extract_end_datetime to a UTC timestamp.
+     When the text holds several dates the last one is the deadline; a date without year takes the year of the previous date
+     (the next year when its month is earlier), and a deadline without time ends at 23:59:59 of that day.
+
+     Args:
+     	 deadline: Output of extract_end_datetime, e.g. '2023-11-7 18:00', '2023-11-7' or an unparsed text
+
+     Returns:
+     	 The timestamp, or None when no valid date is found
+    """
+    if not deadline:
+        return None
+    year, month, last = None, None, None
+    for full_year, full_month, full_day, short_month, short_day, hour, minute in DEADLINE_PATTERN.findall(deadline):
+        if full_year:
+            year, month, day = int(full_year), int(full_month), int(full_day)
+        elif year is None:
+            # 没有年份可以参照，无法确定日期
+            continue
+        else:
+            if int(short_month) < month:
+                year += 1
+            month, day = int(short_month), int(short_day)
+        last = (year, month, day, hour, minute)
+    if last is None:
+        return None
+    year, month, day, hour, minute = last
+    try:
+        if not hour or int(hour) == 24:
+            dt = datetime(year, month, day, 23, 59, 59)
+        else:
+            dt = datetime(year, month, day, int(hour), int(minute))
+    except ValueError:
+        return None
+    return localize_native_dt(dt).timestamp()
+
 def extract_end_dt_with_regex(text: str) -> (bool, str):
     datetime_pattern = r"(\d{4}.\d{1,2}.?(\d{1,2}.?)?(.?\d{1,2}:\d{1,2})?)"
     datetime_matches = re.findall(datetime_pattern, text)
@@ -35,21 +80,53 @@ def extract_end_dt_with_regex(text: str) -> (bool, str):
     except:
         return (False, text)
 
-def extract_end_dt_with_ai(text: str, collect_date_str: str) -> (bool, str):
+_deadline_cache = None
+_deadline_cache_lock = threading.Lock()
+
+def get_deadline_cache() -> PersistentLRUCache:
+    global _deadline_cache
+    if _deadline_cache is None:
+        with _deadline_cache_lock:
+            if _deadline_cache is None:
+                _deadline_cache = PersistentLRUCache(
+                    os.getenv('DEADLINE_CACHE_PATH', './data/deadline_cache.sqlite3'),
+                    table='deadline',
+                    maxsize=int(os.getenv('DEADLINE_CACHE_MAXSIZE', 10000)),
+                )
+    return _deadline_cache
+
+def deadline_cache_key(text: str, collect_date_str: str) -> str:
+    # 合并空白字符，使仅有空白差异的文本命中同一条缓存
+    return f"{collect_date_str}|{' '.join(text.split())}"
+
+def extract_end_dt_with_ai(text: str, collect_date_str: str, timer: Callable[[str], ContextManager] = None) -> (bool, str):
+    # 相同的报名时间文本只调用一次AI服务，解析失败的结果同样缓存
+    cache_key = deadline_cache_key(text, collect_date_str)
+    cached = get_deadline_cache().get(cache_key)
+    if cached is not None:
+        return tuple(cached)
+
     params = {
         'appId': os.getenv('UNI_APP_ID'),
         'collectDate': collect_date_str,
         'text': text,
     }
-    response = requests.get(os.getenv('UNI_APP_AI_CLOUD_URL'), params=params)
+    try:
+        # AI服务响应较慢，使用单独的超时时间；timer 按阶段名返回计时的上下文管理器
+        with timer('ai_deadline') if timer else nullcontext():
+            response = httpclient.get_session().get(os.getenv('UNI_APP_AI_CLOUD_URL'), params=params, timeout=float(os.getenv('AI_HTTP_TIMEOUT', 60)))
+    except requests.RequestException as e:
+        loggers.error_file_logger.error(f"AI服务请求失败,原输入为'{text}': {e}")
+        return (False, text)
     if response.status_code == 200:
         dt = extract_end_dt_with_regex(response.text)
         loggers.debug_file_logger.debug(f"使用AI服务,原输入为'{text}',AI解析后为'{response.text}'")
+        get_deadline_cache().set(cache_key, list(dt))
         return dt
     else:
         return (False, text)
 
-def extract_end_datetime(text: str, collect_date_str: str, pattern: str = None):
+def extract_end_datetime(text: str, collect_date_str: str, pattern: str = None, timer: Callable[[str], ContextManager] = None):
     # 正则匹配仅处理标准格式的情况
     # len('报名时间：2023年1月2日 14:30') = 20
     # 报名时间：2023年1月2日 14:30
@@ -66,8 +143,8 @@ def extract_end_datetime(text: str, collect_date_str: str, pattern: str = None):
         if isSuccess:
             return result
         else:
-            ok, r = extract_end_dt_with_ai(text, collect_date_str)
+            ok, r = extract_end_dt_with_ai(text, collect_date_str, timer)
             return r if ok else None
     else:
-        _, r = extract_end_dt_with_ai(text, collect_date_str)
+        _, r = extract_end_dt_with_ai(text, collect_date_str, timer)
         return r
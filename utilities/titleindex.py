@@ -0,0 +1,43 @@
+import os
+import threading
+from typing import Iterable, Set
+
+class SeenTitleIndex(object):
+    """
+     Persistent local index of article titles that are known to exist in the article store.
+
+     Titles are kept in memory as a set and appended to a plain text file (one title per line),
+     so the index survives restarts. A title is only added once the store has confirmed it,
+     hence a hit never needs to be double checked against the store.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._titles: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self._titles = {line.rstrip('\n') for line in f if line.strip()}
+
+    def __contains__(self, title: str) -> bool:
+        return self._normalize(title) in self._titles
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def _normalize(self, title: str) -> str:
+        # 每行一个标题，标题内的换行符会破坏文件格式
+        return ' '.join(title.splitlines())
+
+    def update(self, titles: Iterable[str]) -> None:
+        with self._lock:
+            new_titles = {self._normalize(t) for t in titles} - self._titles
+            if not new_titles:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.writelines(f'{t}\n' for t in new_titles)
+            self._titles |= new_titles
+
+    def add(self, title: str) -> None:
+        self.update([title])